@@ -0,0 +1,4 @@
+# Relative imports
+from .agent import *
+from .runtime import *
+from .update import *
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import parser.template as template
+import parser.zerocode as zerocode
+
+import im as chat_util  # local
+import packet
+
+from .update import agent_update
+
+# One agent is one signed-in avatar: its circuit, handlers and movement state.
+# Nothing lives in module globals, so any number of agents can share a process.
+
+AGENT_CONTROL_TURN_LEFT = 0x02000000
+AGENT_CONTROL_TURN_RIGHT = 0x04000000
+
+
+class agent:
+    """
+    A bot connected to one region, driven by `run()`.
+    Extra handlers can be registered on `handlers`, see `packet.dispatcher`.
+    """
+
+    def __init__(
+        self,
+        first: str,
+        last: str,
+        password: str,
+        trace: packet.tracer | None = None,
+        pool: packet.login_pool | None = None,
+    ):
+        self.first, self.last, self.password = first, last, password
+        self.pool = pool
+        self.name = f"{first} {last}"
+        self.log = logging.getLogger(f"{__name__}.{first}.{last}")
+        self.trace = trace
+        self.circuit = packet.circuit()
+        self.handlers = packet.dispatcher()
+        self.update = agent_update()  # Movement and camera, see `move()`.
+        self.gen_counter = 0  # Orders AgentThrottle, AgentFOV and AgentHeightWidth.
+        self.prebuilt: dict[str, packet.prebuilt] = {}  # Static messages, per session.
+        self.connected = False
+
+        self.handlers.on("StartPingCheck", self.HandleStartPingCheck)
+        self.handlers.on("RegionHandshake", self.HandleRegionHandshake)
+        self.handlers.on("ChatFromSimulator", self.HandleChatFromSimulator)
+        self.handlers.on("ImprovedInstantMessage", self.HandleImprovedInstantMessage)
+        self.handlers.on("KickUser", self.HandleKickUser)
+
+    async def run(self):
+        """Signs in and handles packets until the region or `close()` ends the circuit."""
+        await self.circuit.login(self.first, self.last, self.password, self.pool)
+        self.log.info("LOGGED IN")
+        try:
+            await self.serve()
+        finally:
+            self.close()
+
+    async def serve(self):
+        """Handles packets of an open circuit, starting with the login preamble."""
+        self.prebuild()
+        self.SendUseCircuitCode()
+        self.SendCompleteAgentMovement()
+        self.connected = True
+        try:
+            while data := await self.circuit.receive():
+                if not self.handle(data):
+                    break
+        finally:
+            self.connected = False
+
+    def handle(self, data: bytes) -> bool:
+        """Returns False once the connection should end."""
+        header = packet.parse_header(data)
+        if self.trace is not None:
+            self.trace.trace(data, header.number)
+        return self.handlers.dispatch(header)
+
+    def close(self):
+        self.connected = False
+        self.circuit.close()
+
+    def keepalive(self):
+        """
+        Called by the runtime's shared timer, the region expects a steady stream.
+        Sends an AgentUpdate if the state changed or it is time for a keepalive.
+        """
+        self.update.send(self.circuit)
+
+    def move(self, control: int):
+        """Sets the control flags, sent now unless the last update was too recent."""
+        self.update.set(control_flags=control)
+        self.update.send(self.circuit)
+
+    def prebuild(self):
+        """Packs the messages whose contents only depend on the session."""
+        circuit, message = self.circuit, template.message
+        ids = (circuit.agent_id_bytes, circuit.session_id_bytes)
+        self.update.open(message["AgentUpdate"], *ids)
+        # fmt: off
+        self.prebuilt = {
+            "UseCircuitCode": packet.prebuilt(
+                message["UseCircuitCode"],
+                circuit.circuit_code_bytes,
+                circuit.session_id_bytes,
+                circuit.agent_id_bytes,
+            ),
+            "CompleteAgentMovement": packet.prebuilt(
+                message["CompleteAgentMovement"], *ids, circuit.circuit_code_bytes
+            ),
+            "AgentHeightWidth": packet.prebuilt(
+                message["AgentHeightWidth"], *ids, circuit.circuit_code_bytes
+            )
+            .counter("GenCounter", packet.u32)
+            .append(packet.u16, 1080, packet.u16, 1920),
+            "AgentFOV": packet.prebuilt(
+                message["AgentFOV"], *ids, circuit.circuit_code_bytes
+            )
+            .counter("GenCounter", packet.u32)
+            .append(packet.f32, 6.233185307179586),
+            "AgentThrottle": packet.prebuilt(
+                message["AgentThrottle"], *ids, circuit.circuit_code_bytes
+            )
+            .counter("GenCounter", packet.u32)
+            .append(
+                packet.variable1, 28,
+                packet.f32, 8.0815,  # Resend
+                packet.f32, 5.5704,  # Land
+                packet.f32, 4.3147,  # Wind
+                packet.f32, 4.3147,  # Cloud
+                packet.f32, 6.8620,  # Task
+                packet.f32, 6.8620,  # Texture
+                packet.f32, 4.4073,  # Asset
+            ),
+        }
+        # fmt: on
+
+    def _send_prebuilt(self, name: str, **fields):
+        self.circuit.send(self.prebuilt[name](self.circuit.sequence, **fields))
+
+    def _next_gen_counter(self) -> int:
+        self.gen_counter = (self.gen_counter + 1) & 0xFFFFFFFF
+        return self.gen_counter
+
+    # UDP messages.
+
+    def SendUseCircuitCode(self):
+        self._send_prebuilt("UseCircuitCode")
+
+    def SendCompleteAgentMovement(self):
+        self._send_prebuilt("CompleteAgentMovement")
+
+    def SendRegionHandshakeReply(self):
+        self.circuit.send(
+            packet.header(
+                template.message["RegionHandshakeReply"],
+                self.circuit.sequence,
+                packet.ZEROCODED,
+            ),
+            zerocode.encode_all(
+                self.circuit.agent_id_bytes,
+                self.circuit.session_id_bytes,
+                packet.u32.zero,
+            ),
+        )
+
+    def SendAgentUpdate(self, control: int | None = None):
+        """Sends the AgentUpdate state now, with new control flags if given."""
+        if control is not None:
+            self.update.set(control_flags=control)
+        self.update.send(self.circuit, force=True)
+
+    def SendCompletePingCheck(self, pingID: int):
+        self.circuit.send(
+            packet.header(template.message["CompletePingCheck"], self.circuit.sequence),
+            packet.pack_sequence(packet.u8, pingID),
+        )
+
+    def SendLogoutRequest(self):
+        self.circuit.send(
+            packet.header(template.message["LogoutRequest"], self.circuit.sequence),
+            self.circuit.agent_id_bytes,
+            self.circuit.session_id_bytes,
+        )
+
+    def SendAgentHeightWidth(self):
+        self._send_prebuilt("AgentHeightWidth", GenCounter=self._next_gen_counter())
+
+    def SendAgentFOV(self):
+        self._send_prebuilt("AgentFOV", GenCounter=self._next_gen_counter())
+
+    def SendAgentThrottle(self):
+        self._send_prebuilt("AgentThrottle", GenCounter=self._next_gen_counter())
+
+    def SendChatFromViewer(self, text: str):
+        self.log.info(f"Sending chat: {text}")
+        self.circuit.send(
+            packet.header(template.message["ChatFromViewer"], self.circuit.sequence),
+            self.circuit.agent_id_bytes,
+            self.circuit.session_id_bytes,
+            chat_util.build_chat(text),
+        )
+
+    def HandleChatFromSimulator(self, header: packet.packet_header):
+        chat = chat_util.parse_chat(header)
+        self.log.info(
+            f"{chat.SourceType} {chat.Type} {chat.Audible} | {chat.FromName}: {chat.Message}"
+        )
+
+    def HandleImprovedInstantMessage(self, header: packet.packet_header):
+        im = chat_util.parse_im(header)
+        self.log.info(im)
+
+    def SendImprovedInstantMessage(
+        self, text: str, to_agent_id: bytes
+    ) -> asyncio.Future:
+        """Resolves to False if the region never acknowledged the IM."""
+        self.log.info(f"Sending IM: {text}")
+        delivered = self.circuit.send_reliable(
+            packet.header(
+                template.message["ImprovedInstantMessage"],
+                self.circuit.sequence,
+                packet.ZEROCODED,
+            ),
+            zerocode.encode_all(
+                chat_util.build_im(
+                    text,
+                    self.name,
+                    self.circuit.agent_id_bytes,
+                    self.circuit.session_id_bytes,
+                    to_agent_id,
+                )
+            ),
+        )
+
+        def ReportDelivery(delivered):
+            if not delivered.result():
+                self.log.warning(f"IM was not delivered: {text}")
+
+        delivered.add_done_callback(ReportDelivery)
+        return delivered
+
+    def HandleKickUser(self, header: packet.packet_header):
+        # After TargetBlock (IP and port) and UserInfo (agent and session IDs).
+        data = packet.unpack_sequence(
+            header.body[header.offset + 38 :],
+            packet.variable2.format,
+            packet.string.format,
+        )
+        reason = packet.string.from_bytes(data[-1])
+        self.log.warning(f"Disconnected: {reason}")
+        return False  # Ends the connection.
+
+    def HandleStartPingCheck(self, header: packet.packet_header):
+        [pingID] = packet.unpack_sequence(
+            header.body[header.offset : header.offset + 1], packet.u8
+        )
+        self.SendCompletePingCheck(pingID)
+
+    def HandleRegionHandshake(self, header: packet.packet_header):
+        self.SendRegionHandshakeReply()
+        self.SendAgentUpdate()
+        self.SendAgentThrottle()
+        self.SendAgentHeightWidth()
+        self.SendAgentFOV()
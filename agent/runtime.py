@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+import packet
+
+from .agent import agent
+
+log = logging.getLogger(__name__)
+
+
+class runtime:
+    """
+    Hosts many agents on one event loop.
+    Their circuits share the loop's selector, and a single timer keeps all of them alive.
+    """
+
+    keepalive_interval = 0.1  # Seconds between checks for due AgentUpdates.
+
+    def __init__(
+        self, trace: packet.tracer | None = None, pool: packet.login_pool | None = None
+    ):
+        self.trace = trace  # Shared by every agent, one writer thread in total.
+        self._own_pool = pool is None
+        self.pool = packet.login_pool() if pool is None else pool  # Shared logins.
+        self.agents: list[agent] = []
+        self._tasks: dict[agent, asyncio.Task] = {}
+        self._running = False
+
+    def add(self, bot: agent) -> agent:
+        """Adds an agent, started at once if the runtime is already running."""
+        if bot.trace is None:
+            bot.trace = self.trace
+        if bot.pool is None:
+            bot.pool = self.pool
+        self.agents.append(bot)
+        if self._running:
+            self._start(bot)
+        return bot
+
+    def _start(self, bot: agent):
+        self._tasks[bot] = task = asyncio.create_task(bot.run())
+        task.add_done_callback(lambda task: self._finished(bot, task))
+
+    def _finished(self, bot: agent, task: asyncio.Task):
+        del self._tasks[bot]
+        self.agents.remove(bot)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            log.error(f"{bot.name} stopped: {e!r}")
+
+    async def run(self):
+        """Runs every agent until all of them have disconnected."""
+        self._running = True
+        for bot in self.agents:
+            self._start(bot)
+        timer = asyncio.create_task(self.keepalive())
+        try:
+            while self._tasks:
+                await asyncio.wait(list(self._tasks.values()))
+        finally:
+            self._running = False
+            timer.cancel()
+            for task in list(self._tasks.values()):
+                task.cancel()
+            if self.trace is not None:
+                self.trace.stop()
+            if self._own_pool:
+                self.pool.close()
+
+    async def keepalive(self):
+        """
+        One timer for all agents instead of a task per agent.
+        Each agent only sends when its `agent.update` is due.
+        """
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            for bot in self.agents:
+                if bot.connected:
+                    bot.keepalive()
+
+    def close(self):
+        """Disconnects every agent, ending `run()`."""
+        for bot in self.agents:
+            if not bot.connected and bot in self._tasks:
+                self._tasks[bot].cancel()  # Still signing in.
+            bot.close()
@@ -0,0 +1,104 @@
+import parser.zerocode as zerocode
+import struct
+import time
+
+import packet
+
+# Viewers send AgentUpdate continuously, which is costly to pack for many agents.
+# The state is kept here and only sent when it changed or the region needs a keepalive;
+# the zerocoded body is reused for as long as nothing changed.
+
+_fields = struct.Struct("<4f4fB3f3f3f3ffLB")
+
+# fmt: off
+FIELDS = (
+    "body_rotation",    # BodyRotation		16
+    "head_rotation",    # HeadRotation		16
+    "state",            # State				1
+    "camera_center",    # CameraCenter		12
+    "camera_at",        # CameraAtAxis		12
+    "camera_left",      # CameraLeftAxis	12
+    "camera_up",        # CameraUpAxis		12
+    "far",              # Far				4
+    "control_flags",    # ControlFlags		4
+    "flags",            # Flags				1
+)
+# fmt: on
+
+
+class agent_update:
+    """
+    AgentUpdate state of one agent. `send()` sends it when a field changed, at most
+    `rate` times a second, or when `keepalive` seconds passed since the last one.
+    """
+
+    rate = 10.0  # Most updates per second.
+    keepalive = 1.0  # Seconds between updates when nothing changes.
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.message = None  # Set by `open()`, with the session IDs.
+        self.ids = b""
+        self.body_rotation = packet.rotation.zero
+        self.head_rotation = packet.rotation.zero
+        self.state = 0
+        self.camera_center = (128.0, 128.0, 30.0)
+        self.camera_at = (0.0, 1.0, 0.0)
+        self.camera_left = (1.0, 0.0, 0.0)
+        self.camera_up = (0.0, 0.0, 1.0)
+        self.far = 16.0
+        self.control_flags = 0
+        self.flags = 0
+        self.changed = True  # Not sent since the last change.
+        self.last = None  # Time of the last update sent.
+        self._body = None
+
+    def open(self, message: int, agent_id: bytes, session_id: bytes):
+        """Starts a session, its first update is due at once."""
+        self.message = message
+        self.ids = agent_id + session_id
+        self.last = None
+        self._body = None
+
+    def set(self, **fields):
+        """Changes fields, see `FIELDS`. Setting a field to its value is not a change."""
+        for name, value in fields.items():
+            if name not in FIELDS:
+                raise AttributeError(f"AgentUpdate has no field {name!r}")
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                self.changed = True
+                self._body = None
+
+    def body(self) -> bytes:
+        """The zerocoded message body, packed again only after a change."""
+        if self._body is None:
+            values = []
+            for name in FIELDS:
+                value = getattr(self, name)
+                if isinstance(value, tuple):
+                    values.extend(value)
+                else:
+                    values.append(value)
+            self._body = zerocode.encode_all(self.ids, _fields.pack(*values))
+        return self._body
+
+    def due(self, now: float) -> bool:
+        if self.last is None:
+            return True
+        if self.changed:
+            return now - self.last >= 1 / self.rate
+        return now - self.last >= self.keepalive
+
+    def send(self, circuit: packet.circuit, force: bool = False) -> bool:
+        """Sends the update if it is due, or `force`d. Returns whether it was sent."""
+        now = self.clock()
+        if not force and not self.due(now):
+            return False
+        circuit.send(
+            packet.header(self.message, circuit.sequence, packet.ZEROCODED),
+            self.body(),
+        )
+        self.last = now
+        self.changed = False
+        return True
@@ -0,0 +1,231 @@
+"""
+Times the codec hot paths and compares them with stored baselines.
+Run from the project root: `python -m benchmarks.suite`
+Record new baselines after an intended change with `--save`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from parser import zerocode
+
+import agent
+import im
+import packet
+from message import body
+
+from .vectors import (
+    AGENT_ID,
+    IMPROVED_INSTANT_MESSAGE_2,
+    REGION_HANDSHAKE,
+    SESSION_ID,
+    START_PING_CHECK,
+    chat_from_simulator,
+    instant_message,
+)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# The original per-byte zerocode implementations, to compare the current ones with.
+
+
+def reference_decode(input: bytes) -> bytes:
+    out = bytearray()
+    i, n = 0, len(input)
+    while i < n:
+        if input[i] == 0x00:
+            out.extend(b"\0" * input[i + 1])
+            i += 2
+        else:
+            out.append(input[i])
+            i += 1
+    return bytes(out)
+
+
+def reference_encode(input: bytes) -> bytes:
+    out = bytearray()
+    i, n = 0, len(input)
+    while i < n:
+        if zeroes := (input[i] == 0x00):
+            while i + zeroes < n and zeroes < 0xFF and input[i + zeroes] == 0x00:
+                zeroes += 1
+            out.extend([0x00, zeroes])
+            i += zeroes
+        else:
+            out.append(input[i])
+            i += 1
+    return bytes(out)
+
+
+def reference_message_number(input: bytes) -> int:
+    """Message ID sniffing by decoding the whole body."""
+    input = reference_decode(input[packet.BODY_BYTE :])
+    if input.startswith(b"\xff\xff"):
+        return int.from_bytes(input[:4])
+    elif input.startswith(b"\xff"):
+        return int.from_bytes(input[:2]) << 16
+    return int.from_bytes(input[:1]) << 24
+
+
+# Field formats of an AgentUpdate, see `agent.agent_update`.
+AGENT_UPDATE = (
+    (packet.rotation, packet.rotation.zero),
+    (packet.rotation, packet.rotation.zero),
+    (packet.u8, 0),
+    (packet.vector, (128.0, 128.0, 30.0)),
+    (packet.vector, (0.0, 1.0, 0.0)),
+    (packet.vector, (1.0, 0.0, 0.0)),
+    (packet.vector, (0.0, 0.0, 1.0)),
+    (packet.f32, 16.0),
+    (packet.u32, 0),
+    (packet.u8, 0),
+)
+
+# Field formats of `im.parse_im()`.
+IM_FORMATS = (
+    (packet.uuid, packet.uuid, packet.bool, packet.uuid, packet.u32, packet.uuid)
+    + (packet.vector, packet.u8, packet.u8, packet.uuid, packet.u32)
+    + (packet.variable1, packet.string, packet.variable2, packet.string)
+    + (packet.variable2, packet.string)
+)
+
+
+def cases() -> dict[str, tuple]:
+    """Returns each benchmark as a function and its arguments."""
+    handshake = zerocode.hex2byte(REGION_HANDSHAKE)
+    handshake_body = zerocode.decode(handshake[packet.BODY_BYTE :])
+    message = zerocode.hex2byte(IMPROVED_INSTANT_MESSAGE_2)
+    ping = zerocode.hex2byte(START_PING_CHECK)
+    large = instant_message("lorem ipsum " * 80)  # Close to the MTU.
+    large_body = zerocode.decode(large[packet.BODY_BYTE :])
+    sparse = bytes(range(1, 5)) + bytes(60000) + b"\x01" * 4000  # Long zero runs.
+    fields = [x for pair in AGENT_UPDATE for x in pair]
+    im_fields = zerocode.decode(message[packet.BODY_BYTE :])[4:]
+    decoded = body.ImprovedInstantMessage.from_bytes(message)
+    update = agent.agent_update()
+    update.open(4 << 24, AGENT_ID, SESSION_ID)
+
+    def changed_update() -> bytes:
+        update.set(control_flags=update.control_flags ^ 1)
+        return update.body()
+
+    # fmt: off
+    return {
+        "zerocode.decode RegionHandshake":  (zerocode.decode, handshake[packet.BODY_BYTE :]),
+        "zerocode.decode RegionHandshake (per-byte)": (reference_decode, handshake[packet.BODY_BYTE :]),
+        "zerocode.decode large IM":         (zerocode.decode, large[packet.BODY_BYTE :]),
+        "zerocode.decode 64 KiB sparse":    (zerocode.decode, zerocode.encode(sparse)),
+        "zerocode.decode 64 KiB sparse (per-byte)": (reference_decode, zerocode.encode(sparse)),
+        "zerocode.encode RegionHandshake":  (zerocode.encode, handshake_body),
+        "zerocode.encode RegionHandshake (per-byte)": (reference_encode, handshake_body),
+        "zerocode.encode large IM":         (zerocode.encode, large_body),
+        "zerocode.encode 64 KiB sparse":    (zerocode.encode, sparse),
+        "zerocode.encode 64 KiB sparse (per-byte)": (reference_encode, sparse),
+        "packet.message_number RegionHandshake": (packet.message_number, handshake),
+        "packet.message_number RegionHandshake (per-byte)": (reference_message_number, handshake),
+        "packet.pack_sequence AgentUpdate": (packet.pack_sequence, *fields),
+        "agent_update.body changed":        (changed_update,),
+        "agent_update.body unchanged":      (update.body,),
+        "packet.unpack_sequence IM":        (packet.unpack_sequence, im_fields, *IM_FORMATS),
+        "packet.header Low":                (packet.header, packet.UseCircuitCode, 1234),
+        "packet.header High zerocoded":     (packet.header, 4 << 24, 1234, packet.ZEROCODED),
+        "packet.parse_header":              (packet.parse_header, handshake),
+        "Message.from_bytes StartPingCheck": (body.StartPingCheck.from_bytes, ping),
+        "Message.from_bytes IM":            (body.ImprovedInstantMessage.from_bytes, message),
+        "Message.from_bytes RegionHandshake": (body.RegionHandshake.from_bytes, handshake),
+        "Message.to_bytes IM":              (decoded.to_bytes,),
+        "Message.view IM":                  (lambda: body.ImprovedInstantMessage.view(message)["Message"],),
+        "im.parse_im":                      (im.parse_im, message),
+        "im.parse_im large":                (im.parse_im, large),
+        "im.parse_chat":                    (im.parse_chat, chat_from_simulator("hello")),
+        "im.parse_chat large":              (im.parse_chat, chat_from_simulator("lorem ipsum " * 80)),
+    }
+    # fmt: on
+
+
+def measure(function, *args) -> float:
+    """Returns microseconds per call, best of 3 runs of about 0.2 seconds."""
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def run(selected: str = "") -> dict[str, float]:
+    return {name: measure(*case) for name, case in cases().items() if selected in name}
+
+
+def machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def load(path: str = BASELINE) -> dict:
+    if not os.path.isfile(path):
+        return {"machine": {}, "results": {}}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save(results: dict[str, float], path: str = BASELINE):
+    baseline = load(path)
+    baseline["machine"] = machine()
+    baseline["results"] |= {k: round(v, 3) for k, v in results.items()}
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> tuple[list[str], list[str]]:
+    """
+    Returns the report lines and the names of cases slower than `threshold` times the baseline.
+    """
+    lines = [f"{'case':<50}{'baseline':>12}{'current':>12}{'ratio':>8}"]
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append(f"{name:<50}{'-':>12}{current:>10.2f}us{'new':>8}")
+            continue
+        ratio = current / before
+        note = ""
+        if ratio > threshold:
+            note = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            note = "  faster"
+        lines.append(
+            f"{name:<50}{before:>10.2f}us{current:>10.2f}us{ratio:>7.2f}x{note}"
+        )
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    args.add_argument("-k", default="", help="only run cases containing this text")
+    args.add_argument("--save", action="store_true", help="record results as baseline")
+    args.add_argument("--baseline", default=BASELINE)
+    args.add_argument(
+        "--threshold", type=float, default=1.25, help="slowdown reported as regression"
+    )
+    args = args.parse_args()
+
+    results = run(args.k)
+    baseline = load(args.baseline)
+    if baseline["machine"] and baseline["machine"] != machine():
+        print(f"Baseline recorded on {baseline['machine']}, ratios are approximate.")
+    lines, regressions = compare(results, baseline["results"], args.threshold)
+    print("\n".join(lines))
+    if args.save:
+        save(results, args.baseline)
+        print(f"Saved {len(results)} results to {args.baseline}")
+    elif regressions:
+        sys.exit(f"{len(regressions)} regression(s) over {args.threshold}x")
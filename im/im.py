@@ -60,9 +60,18 @@ class ImprovedInstantMessage(NamedTuple):
     BinaryBucket: bytes
 
 
-def parse_im(data: bytes) -> ImprovedInstantMessage:
+def _header(data: bytes | packet.packet_header) -> packet.packet_header:
+    """Handlers already have the header parsed, with the zerocoded body decoded."""
+    if isinstance(data, packet.packet_header):
+        return data
+    return packet.parse_header(data)
+
+
+def parse_im(data: bytes | packet.packet_header) -> ImprovedInstantMessage:
+    """Expects a parsed header, or bytes from the beginning of the packet."""
+    header = _header(data)
     data = packet.unpack_sequence(
-        zerocode.decode(data[6:])[4:],
+        header.body[header.offset :],
         packet.uuid,
         packet.uuid,
         packet.bool,
@@ -186,9 +195,11 @@ class ChatType(IntEnum):
     OwnerSay = 8
 
 
-def parse_chat(data) -> ChatFromSimulator:
+def parse_chat(data: bytes | packet.packet_header) -> ChatFromSimulator:
+    """Expects a parsed header, or bytes from the beginning of the packet."""
+    header = _header(data)
     data = packet.unpack_sequence(
-        data[10:],
+        header.body[header.offset :],
         packet.variable1,
         packet.string,
         packet.uuid,
@@ -200,7 +211,6 @@ def parse_chat(data) -> ChatFromSimulator:
         packet.variable2,
         packet.string,
     )
-    print("parse_chat data", data)
     return ChatFromSimulator(
         data[0],
         packet.string.from_bytes(data[1]),
@@ -1,9 +1,9 @@
+import asyncio
 import logging
-import parser.template as template
-import parser.zerocode as zerocode
+import os
 import threading  # for user input
-import time
 
+import agent
 import im as chat_util  # local
 import packet as packet
 
@@ -12,320 +12,103 @@ logging.basicConfig(
 )
 log = logging.getLogger()
 
-ignored_logging = [
-    "LayerData",
-    "SimulatorViewerTimeMessage",
-    "ObjectUpdate",
-    "ObjectUpdateCompressed",
-    "ObjectUpdateCached" "ImprovedTerseObjectUpdate",
-    "AvatarAnimation",
-    "CoarseLocationUpdate",
-    "PreloadSound",
-    "AttachedSound",
-    "ScriptControlChange",
-    "StartPingCheck",
-    "ViewerEffect",
-]
-
-client = packet.client()
-client.login("firstname", "lastname", "password")
-
-log.info("LOGGED IN")
+# Share of each message traced to `dump.log`, unlisted messages are always traced.
+trace_rates = {
+    "LayerData": 0,
+    "SimulatorViewerTimeMessage": 0,
+    "ObjectUpdate": 0.01,
+    "ObjectUpdateCompressed": 0.01,
+    "ObjectUpdateCached": 0.01,
+    "ImprovedTerseObjectUpdate": 0.01,
+    "AvatarAnimation": 0,
+    "CoarseLocationUpdate": 0,
+    "PreloadSound": 0,
+    "AttachedSound": 0,
+    "ScriptControlChange": 0,
+    "StartPingCheck": 0,
+    "ViewerEffect": 0,
+}
+
+IM_TARGET = packet.uuid.from_string("779e1d56-5500-4e22-940a-cd7b5adddbe0")
 
 # User input handler.
 
-user_input = None
 
-AGENT_CONTROL_TURN_LEFT = 0x02000000
-AGENT_CONTROL_TURN_RIGHT = 0x04000000
+def UserInputThread(loop: asyncio.AbstractEventLoop, lines: asyncio.Queue):
+    """Blocking `input()` lives on its own thread and hands lines to the event loop."""
+    while True:
+        loop.call_soon_threadsafe(lines.put_nowait, input())
 
 
-def UserInputThread():
-    global user_input
+async def UserInput(bot: agent.agent):
+    lines = asyncio.Queue()
+    threading.Thread(
+        name="user_input_thread",
+        target=UserInputThread,
+        args=(asyncio.get_running_loop(), lines),
+        daemon=True,
+    ).start()
     while True:
-        user_input = input()
+        HandleUserInput(bot, await lines.get())
 
 
-def HandleUserInput():
-    global user_input
+def HandleUserInput(bot: agent.agent, user_input: str):
     if user_input.lower() == "q":
-        SendLogoutRequest()
-        exit()
+        bot.SendLogoutRequest()
+        bot.close()
+        return
     if user_input == "A":
         log.info(f"sending input: {user_input}")
-        SendAgentUpdate(AGENT_CONTROL_TURN_LEFT)
+        bot.move(agent.AGENT_CONTROL_TURN_LEFT)
     elif user_input == "D":
         log.info(f"sending input: {user_input}")
-        SendAgentUpdate(AGENT_CONTROL_TURN_RIGHT)
+        bot.move(agent.AGENT_CONTROL_TURN_RIGHT)
     elif user_input == "S":
         log.info(f"sending input: {user_input}")
-        SendAgentUpdate(0)
+        bot.move(0)
     else:
-        SendImprovedInstantMessage(user_input)
-    user_input = None
-    pass
-
-
-user_input_thread = threading.Thread(
-    name="user_input_thread", target=UserInputThread, daemon=True
-)
-user_input_thread.start()
-
-# UDP messages.
-
-
-def SendUseCircuitCode():
-    client.send(
-        packet.header(template.message["UseCircuitCode"], client.sequence),
-        client.circuit_code_bytes,
-        client.session_id_bytes,
-        client.agent_id_bytes,
-    )
-
-
-def SendCompleteAgentMovement():
-    client.send(
-        packet.header(template.message["CompleteAgentMovement"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-        client.circuit_code_bytes,
-    )
-
-
-def SendRegionHandshakeReply():
-    client.send(
-        packet.header(
-            template.message["RegionHandshakeReply"], client.sequence, packet.ZEROCODED
-        ),
-        zerocode.encode_all(
-            client.agent_id_bytes, client.session_id_bytes, packet.u32.zero
-        ),
-    )
-
-
-def SendAgentUpdate(control: int = 0):
-    client.send(
-        packet.header(
-            template.message["AgentUpdate"], client.sequence, packet.ZEROCODED
-        ),
-        zerocode.encode_all(
-            # client.agent_id_bytes,
-            # client.session_id_bytes,
-            # b'\x00' * 106,
-            packet.pack_sequence(
-                packet.uuid,
-                client.agent_id_bytes,
-                packet.uuid,
-                client.session_id_bytes,
-                packet.rotation,
-                packet.rotation.zero,  # BodyRotation		16
-                packet.rotation,
-                packet.rotation.zero,  # HeadRotation		16
-                packet.u8,
-                0,  # State				1
-                packet.vector,
-                (128.0, 128.0, 30.0),  # CameraCenter		12
-                packet.vector,
-                (0.0, 1.0, 0.0),  # CameraAtAxis		12
-                packet.vector,
-                (1.0, 0.0, 0.0),  # CameraLeftAxis	12
-                packet.vector,
-                (0.0, 0.0, 1.0),  # CameraUpAxis		12
-                packet.f32,
-                16.0,  # Far				4
-                packet.u32,
-                control if control else 0,  # ControlFlags		4
-                packet.u8,
-                0,  # Flags				1
-            )
-        ),
-    )
-
-
-def SendCompletePingCheck(pingID: int):
-    client.send(
-        packet.header(template.message["CompletePingCheck"], client.sequence),
-        packet.pack_sequence(packet.u8, pingID),
-    )
-
-
-def SendPacketAck(message_number: int):
-    client.send(
-        packet.header(template.message["PacketAck"], client.sequence),
-        packet.pack_sequence(
-            packet.u8,
-            1,
-            packet.u32,
-            message_number,
-        ),
-    )
-
+        delivered = bot.SendImprovedInstantMessage(user_input, IM_TARGET)
 
-def SendLogoutRequest():
-    client.send(
-        packet.header(template.message["LogoutRequest"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-    )
+        def ReportDelivery(delivered):
+            if not delivered.result():
+                print(f"IM not delivered: {user_input}")
 
+        delivered.add_done_callback(ReportDelivery)
 
-def SendAgentHeightWidth():
-    client.send(
-        packet.header(template.message["AgentHeightWidth"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-        client.circuit_code_bytes,
-        packet.pack_sequence(packet.u32, 0, packet.u16, 1080, packet.u16, 1920),
-    )
 
+# Console output, next to the agent's own handlers.
 
-def SendAgentFOV():
-    client.send(
-        packet.header(template.message["AgentFOV"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-        client.circuit_code_bytes,
-        packet.pack_sequence(packet.u32, 0, packet.f32, 6.233185307179586),
-    )
 
-
-def SendAgentThrottle():
-    client.send(
-        packet.header(template.message["AgentThrottle"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-        client.circuit_code_bytes,
-        packet.pack_sequence(
-            packet.u32,
-            0,
-            packet.variable1,
-            28,
-            packet.f32,
-            8.0815,
-            packet.f32,
-            5.5704,
-            packet.f32,
-            4.3147,
-            packet.f32,
-            4.3147,
-            packet.f32,
-            6.8620,
-            packet.f32,
-            6.8620,
-            packet.f32,
-            4.4073,
-        ),
-    )
-
-
-def SendChatFromViewer(text: str):
-    log.info(f"Sending chat: {text}")
-    client.send(
-        packet.header(template.message["ChatFromViewer"], client.sequence),
-        client.agent_id_bytes,
-        client.session_id_bytes,
-        chat_util.build_chat(text),
-    )
-
-
-def HandleChatFromSimulator(data: bytes):
-    chat = chat_util.parse_chat(data)
-    log.info(
-        f"{chat.SourceType} {chat.Type} {chat.Audible} | {chat.FromName}: {chat.Message}"
-    )
+def PrintChatFromSimulator(header: packet.packet_header):
+    chat = chat_util.parse_chat(header)
     if chat.Type <= chat_util.ChatType.Say:
         print(f"{chat.FromName}: {chat.Message}")
 
 
-def HandleImprovedInstantMessage(data: bytes):
-    im = chat_util.parse_im(data)
-    log.info(im)
+def PrintImprovedInstantMessage(header: packet.packet_header):
+    im = chat_util.parse_im(header)
     if im.Dialog == chat_util.Dialog.IM:
         print(f"IM - {im.FromAgentName}: {im.Message}")
 
 
-def SendImprovedInstantMessage(text: str):
-    log.info(f"Sending IM: {text}")
-    client.send(
-        packet.header(
-            template.message["ImprovedInstantMessage"],
-            client.sequence,
-            packet.ZEROCODED | packet.RELIABLE,
-        ),
-        zerocode.encode_all(
-            chat_util.build_im(
-                text,
-                "llScriptProfiler Resident",
-                client.agent_id_bytes,
-                client.session_id_bytes,
-                packet.uuid.from_string("779e1d56-5500-4e22-940a-cd7b5adddbe0"),
-            )
-        ),
-    )
-
-
-def HandleKickUser(data: bytes):
-    data = packet.unpack_sequence(
-        data[48:], packet.variable2.format, packet.string.format
-    )
-    reason = packet.string.from_bytes(data[-1])
-    log.warning(f"Disconnected: {reason}")
-
-
-def TimePassed(seconds: float) -> bool:
-    present = time.time()
-    earlier = getattr(TimePassed, "time", present)
-    elapsed = (present - earlier) >= seconds
-    TimePassed.time = present if elapsed else earlier
-    return elapsed
-
-
-# Login preamble.
-
-SendUseCircuitCode()
-SendCompleteAgentMovement()
-
-# Main connection loop.
-
-while data := client.receive():
-    number = packet.message_number(data)
-    message = template.message[number]
-
-    if message not in ignored_logging:
-        log.debug(
-            "%s\t%s\n\tUDP: %s",
-            packet.human_header(data),
-            message,
-            zerocode.byte2hex(data),
-        )
-
-    if packet.is_reliable(data):
-        sequence_number = packet.sequence_number(data)
-        SendPacketAck(sequence_number)
-
-    if message == "StartPingCheck":
-        [pingID] = packet.unpack_sequence(data[7:8], packet.u8)
-        SendCompletePingCheck(pingID)
-
-    if message == "RegionHandshake":
-        SendRegionHandshakeReply()
-        SendAgentUpdate()
-        SendAgentThrottle()
-        SendAgentHeightWidth()
-        SendAgentFOV()
-
-    if message == "ChatFromSimulator":
-        HandleChatFromSimulator(data)
-
-    if message == "ImprovedInstantMessage":
-        HandleImprovedInstantMessage(data)
+async def main():
+    bots = agent.runtime(packet.tracer(log, trace_rates))
+    bot = bots.add(agent.agent("firstname", "lastname", "password"))
+    bot.handlers.on("ChatFromSimulator", PrintChatFromSimulator)
+    bot.handlers.on("ImprovedInstantMessage", PrintImprovedInstantMessage)
+    if path := os.environ.get("SL_CAPTURE"):
+        bot.circuit.capture = packet.recorder(
+            path
+        )  # Replay with `packet.capture.replay()`.
 
-    # if TimePassed(0.5):
-    # 	SendAgentUpdate()
+    user_input = asyncio.create_task(UserInput(bot))
+    try:
+        await bots.run()
+    finally:
+        user_input.cancel()
+        if bot.circuit.capture is not None:
+            bot.circuit.capture.close()
 
-    if message == "KickUser":
-        HandleKickUser(data)
-        break
 
-    if user_input:
-        HandleUserInput()
+if __name__ == "__main__":
+    asyncio.run(main())
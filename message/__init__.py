@@ -1,4 +1,7 @@
 import message.data
+import message.codec
 import message.body
 import message.encode
 import message.decode
+import message.view
+import message.generic
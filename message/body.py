@@ -1,6 +1,7 @@
 import struct
 from parser import zerocode
 
+from message.codec import Codec
 from message.data import (  # NOQA
     F32,
     F64,
@@ -31,6 +32,11 @@ class Message:
     _zerocoded = False
     _frequency = Format.alias("Low").size
     _keys = {}
+    _codec = Codec(_keys)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._codec = Codec(cls._keys)  # Compiled once per message.
 
     def __init__(self):
         self._data = dict.fromkeys(self._keys)
@@ -0,0 +1,328 @@
+import struct
+from array import array
+
+from message.data import Format, Variable1
+
+# Message fields are compiled once into a list of steps.
+# Consecutive fixed-size fields are merged into a single `struct.Struct`,
+# so decoding only branches where a variable-length field interrupts the run.
+
+
+class Codec:
+    """
+    Precompiled decoder/encoder for an ordered mapping of field names to formats.
+    Values are the raw unpacked data (`int`, `float`, `bytes`, `tuple`),
+    with variable fields as `(length, bytes)` pairs.
+
+    A nested `dict` is a single block and decodes into a list of its values.
+    A `(count, dict)` pair is a repeated block and decodes into `Columns`,
+    where `count` is either a fixed number or `Variable1` for a 1-byte count.
+
+    Each field also gets a `(read, skip)` pair in `fields`, used by lazy views
+    to decode a single field without unpacking the ones before it.
+    """
+
+    def __init__(self, keys: dict):
+        self.names = tuple(keys)
+        self.types = tuple(keys.values())
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.size = 0  # Minimum size in bytes.
+        self.fields = [_field(impl) for impl in self.types]
+        self.typecodes = [_typecode(impl) for impl in self.types]
+        self.layout = None  # One struct for all fields, if they are all fixed-size.
+        self.layout_index = None  # Position of each field's values in `layout`.
+        self._decoders = []
+        self._encoders = []
+
+        run = []  # Pending fixed-size fields.
+        for impl in self.types:
+            if isinstance(impl, dict):
+                self._flush(run)
+                block = Codec(impl)
+                self._decoders.append(_decode_block(block))
+                self._encoders.append(_encode_block(block))
+                self.size += block.size
+            elif isinstance(impl, tuple):
+                self._flush(run)
+                repeat, block = impl[0], Codec(impl[1])
+                self._decoders.append(_decode_repeated(repeat, block))
+                self._encoders.append(_encode_repeated(repeat, block))
+                self.size += repeat * block.size if isinstance(repeat, int) else 1
+            elif issubclass(impl, Variable1):
+                self._flush(run)
+                prefix = struct.Struct(impl.prefix)
+                self._decoders.append(_decode_variable(prefix))
+                self._encoders.append(_encode_variable(prefix))
+                self.size += prefix.size
+            elif impl.format[0] in ">!":  # Network byte order is never merged.
+                self._flush(run)
+                self._flush([impl])
+            else:
+                run.append(impl)
+        self._flush(run)
+
+    def _flush(self, run: list):
+        """Merges pending fixed-size fields into one step."""
+        if not run:
+            return
+        if len(run) == 1:
+            layout = struct.Struct(run[0].format)
+        else:
+            layout = struct.Struct("<" + "".join(x.format.lstrip("<") for x in run))
+        index, grouped, i = [], False, 0
+        for impl in run:
+            count = _value_count(impl)
+            index.append(i if count == 1 else slice(i, i + count))
+            grouped |= count != 1
+            i += count
+        self._decoders.append(_decode_fixed(layout, index if grouped else None))
+        self._encoders.append(_encode_fixed(layout, index if grouped else None))
+        if len(run) == len(self.types) and not self.size:
+            self.layout, self.layout_index = layout, index
+        self.size += layout.size
+        run.clear()
+
+    def decode(self, buffer, offset: int = 0) -> tuple[list, int]:
+        """Returns unpacked values in field order and the offset after the last field."""
+        if len(buffer) - offset < self.size:
+            raise ValueError(
+                f"Expected at least {self.size} bytes, got {len(buffer) - offset}"
+            )
+        out = []
+        for step in self._decoders:
+            offset = step(buffer, offset, out)
+        return out, offset
+
+    def encode(self, values) -> bytes:
+        """Packs values (in field order) into bytes."""
+        out = bytearray()
+        i = 0
+        for step in self._encoders:
+            i = step(values, i, out)
+        return bytes(out)
+
+
+class Columns(dict):
+    """
+    Entries of a repeated block, one column per field name in field order.
+    Single numbers are `array.array` columns, other values are tuples (one per entry).
+    """
+
+    __slots__ = ("count",)
+
+    def __init__(self, names, columns, count: int):
+        super().__init__(zip(names, columns))
+        self.count = count  # Number of entries.
+
+    def rows(self) -> list[tuple]:
+        """Returns the values of each entry in field order."""
+        return list(zip(*self.values())) if self.count else []
+
+    def records(self) -> list[dict]:
+        """Returns each entry as a dict, costly for many entries."""
+        return [dict(zip(self, row)) for row in self.rows()]
+
+
+def _value_count(impl: Format) -> int:
+    layout = struct.Struct(impl.format)
+    return len(layout.unpack(bytes(layout.size)))
+
+
+def _typecode(impl) -> str | None:
+    """Returns the `array` type code of a single-number field, None otherwise."""
+    if isinstance(impl, (dict, tuple)) or issubclass(impl, Variable1):
+        return None
+    code = impl.format.lstrip("<>!=@")
+    return code if code in "bBhHiIlLqQfd" and len(code) == 1 else None
+
+
+def _field(impl) -> tuple:
+    """Returns `read(buffer, offset) -> (value, end)` and `skip(buffer, offset) -> end`."""
+    if isinstance(impl, (dict, tuple)):
+        if isinstance(impl, dict):
+            step = _decode_block(Codec(impl))
+        else:
+            step = _decode_repeated(impl[0], Codec(impl[1]))
+
+        def read(buffer, offset: int) -> tuple:
+            out = []
+            offset = step(buffer, offset, out)
+            return out[0], offset
+
+        return read, lambda buffer, offset: read(buffer, offset)[1]
+
+    if issubclass(impl, Variable1):
+        prefix = struct.Struct(impl.prefix)
+        unpack_from, size = prefix.unpack_from, prefix.size
+
+        def read(buffer, offset: int) -> tuple:
+            [length] = unpack_from(buffer, offset)
+            offset += size
+            return (length, bytes(buffer[offset : offset + length])), offset + length
+
+        def skip(buffer, offset: int) -> int:
+            return offset + size + unpack_from(buffer, offset)[0]
+
+        return read, skip
+
+    layout = struct.Struct(impl.format)
+    unpack_from, size = layout.unpack_from, layout.size
+    single = _value_count(impl) == 1
+
+    def read(buffer, offset: int) -> tuple:
+        values = unpack_from(buffer, offset)
+        return values[0] if single else values, offset + size
+
+    return read, lambda buffer, offset: offset + size
+
+
+def _decode_fixed(layout: struct.Struct, index: list | None):
+    unpack_from, size = layout.unpack_from, layout.size
+
+    if index is None:
+
+        def step(buffer, offset: int, out: list) -> int:
+            out.extend(unpack_from(buffer, offset))
+            return offset + size
+
+    else:
+
+        def step(buffer, offset: int, out: list) -> int:
+            values = unpack_from(buffer, offset)
+            out.extend([values[i] for i in index])
+            return offset + size
+
+    return step
+
+
+def _encode_fixed(layout: struct.Struct, index: list | None):
+    pack = layout.pack
+
+    if index is None:
+        count = len(layout.unpack(bytes(layout.size)))
+
+        def step(values, i: int, out: bytearray) -> int:
+            out += pack(*values[i : i + count])
+            return i + count
+
+    else:
+        count = len(index)
+        grouped = [isinstance(x, slice) for x in index]
+
+        def step(values, i: int, out: bytearray) -> int:
+            flat = []
+            for value, is_group in zip(values[i : i + count], grouped):
+                if is_group:
+                    flat.extend(value)
+                else:
+                    flat.append(value)
+            out += pack(*flat)
+            return i + count
+
+    return step
+
+
+def _decode_variable(prefix: struct.Struct):
+    unpack_from, size = prefix.unpack_from, prefix.size
+
+    def step(buffer, offset: int, out: list) -> int:
+        [length] = unpack_from(buffer, offset)
+        offset += size
+        out.append((length, bytes(buffer[offset : offset + length])))
+        return offset + length
+
+    return step
+
+
+def _encode_variable(prefix: struct.Struct):
+    pack = prefix.pack
+
+    def step(values, i: int, out: bytearray) -> int:
+        length, data = values[i]
+        out += pack(length)
+        out += data[:length].ljust(length, b"\x00")
+        return i + 1
+
+    return step
+
+
+def _decode_block(block: Codec):
+    decode = block.decode
+
+    def step(buffer, offset: int, out: list) -> int:
+        values, offset = decode(buffer, offset)
+        out.append(values)
+        return offset
+
+    return step
+
+
+def _encode_block(block: Codec):
+    encode = block.encode
+
+    def step(values, i: int, out: bytearray) -> int:
+        out += encode(values[i])
+        return i + 1
+
+    return step
+
+
+def _decode_repeated(repeat, block: Codec):
+    decode, layout = block.decode, block.layout
+    fixed = isinstance(repeat, int)
+    count = struct.Struct(Variable1.prefix)
+    names, typecodes = block.names, block.typecodes
+    width = len(names)
+    if layout is not None:
+        flat_width = len(layout.unpack(bytes(layout.size)))
+        index = block.layout_index
+
+    def step(buffer, offset: int, out: list) -> int:
+        if fixed:
+            n = repeat
+        else:
+            [n] = count.unpack_from(buffer, offset)
+            offset += count.size
+        if layout is not None:  # Every entry in one pass, without per-entry lists.
+            end = offset + n * layout.size
+            if end > len(buffer):
+                raise ValueError(f"Expected {n} entries of {layout.size} bytes")
+            records = layout.iter_unpack(memoryview(buffer)[offset:end])
+            flat = list(zip(*records)) or [()] * flat_width
+            columns = [
+                tuple(zip(*flat[i])) if isinstance(i, slice) else flat[i] for i in index
+            ]
+            offset = end
+        else:
+            rows = []
+            for _ in range(n):
+                values, offset = decode(buffer, offset)
+                rows.append(values)
+            columns = list(zip(*rows)) or [()] * width
+        for i, typecode in enumerate(typecodes):
+            if typecode is not None:
+                columns[i] = array(typecode, columns[i])
+        out.append(Columns(names, columns, n))
+        return offset
+
+    return step
+
+
+def _encode_repeated(repeat, block: Codec):
+    encode = block.encode
+    fixed = isinstance(repeat, int)
+    count = struct.Struct(Variable1.prefix)
+
+    def step(values, i: int, out: bytearray) -> int:
+        rows = values[i]
+        if isinstance(rows, Columns):
+            rows = rows.rows()
+        if fixed and len(rows) != repeat:
+            raise ValueError(f"Expected {repeat} entries, got {len(rows)}")
+        if not fixed:
+            out += count.pack(len(rows))
+        for row in rows:
+            out += encode(row)
+        return i + 1
+
+    return step
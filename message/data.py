@@ -31,8 +31,8 @@ class S16(Format): format = "<h"; size = 2; zero = b"\x00" * size
 class U32(Format): format = "<I"; size = 4; zero = b"\x00" * size
 class S32(Format): format = "<i"; size = 4; zero = b"\x00" * size
 class F32(Format): format = "<f"; size = 4; zero = b"\x00" * size
-class U64(Format): format = "<q"; size = 8; zero = b"\x00" * size
-class S64(Format): format = "<Q"; size = 8; zero = b"\x00" * size
+class U64(Format): format = "<Q"; size = 8; zero = b"\x00" * size
+class S64(Format): format = "<q"; size = 8; zero = b"\x00" * size
 class F64(Format): format = "<d"; size = 8; zero = b"\x00" * size
 # fmt: on
 
@@ -63,6 +63,46 @@ class Rotation(Format):
         self._data = value
 
 
+class Vector3d(Vector):
+    format = "<ddd"
+
+
+class Vector4(Rotation):
+    pass  # Four floats, identical to Rotation
+
+
+class Quaternion(Vector):
+    format = "<fff"  # Normalized, W is implied
+
+
+class IPAddr(Format):
+    format = "4s"  # Network byte order
+    size = 4
+    zero = b"\x00" * size
+
+
+class IPPort(Format):
+    format = ">H"  # Network byte order
+    size = 2
+    zero = b"\x00" * size
+
+
+class Bytes(Format):
+    format = "0s"
+    size = 0
+
+    def sized(size: int) -> type[Self]:
+        """Returns a fixed-size bytes format, such as template `Fixed 32`."""
+        if size not in _sized:
+            zero = b"\x00" * size
+            attributes = {"format": f"{size}s", "size": size, "zero": zero}
+            _sized[size] = type(f"Bytes{size}", (Bytes,), attributes)
+        return _sized[size]
+
+
+_sized = {}
+
+
 class Uuid(Format):
     format = "16s"
     zero = UUID(int=0).bytes
@@ -89,6 +129,7 @@ class Uuid(Format):
 
 class Variable1(Format):
     format = "<B*s"
+    prefix = "<B"
     zero = b"\x00"
 
     def __init__(self, value):
@@ -114,3 +155,26 @@ class Variable1(Format):
 
 class Variable2(Variable1):
     format = "<H*s"
+    prefix = "<H"
+
+
+class Block(Format):
+    """Entries of a repeated block, stored as `Columns` of unpacked values."""
+
+    def __init__(self, value):
+        self._data = value
+
+    def __str__(self) -> str:
+        return f"[{self.length}] {pretty(self.value)}"
+
+    def __getitem__(self, name: str):
+        """Returns the column of a field, one value per entry."""
+        return self._data[name]
+
+    @property
+    def value(self):
+        return self._data.records()
+
+    @property
+    def length(self):
+        return self._data.count
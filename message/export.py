@@ -0,0 +1,367 @@
+import json
+import os
+import queue
+import threading
+from array import array
+
+from message import generic
+from message.body import Message
+from message.codec import Columns, _typecode
+from message.data import Variable1
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Decoded messages are exported as columns, one table per message and repeated block,
+# for offline analysis. Rows are collected in bounded batches per table, and full
+# batches are written by a background thread while decoding continues.
+#
+# Tables are named after the message (`ChatFromSimulator`), or the message and its
+# repeated block (`CoarseLocationUpdate.Location`). Every table has a `time` column,
+# block tables also a `message` column with the row of their message.
+# Numbers are typed columns, vectors and rotations get one column per component
+# (`Position.x`), UUIDs, fixed and variable fields are byte strings.
+#
+# Formats, by what is installed:
+# - parquet: one `<table>.parquet` file per table, a row group per batch (pyarrow).
+# - npz: `<table>.<chunk>.npz` per batch (numpy), byte columns as `.data` and `.offsets`.
+# - raw: `<table>.<chunk>.bin` per batch, the column arrays back to back, described by
+#   `<table>.<chunk>.json`, so chunks can be memory-mapped without any dependency.
+
+AXES = "xyzw"
+
+
+def columns(keys: dict, prefix: str = "") -> list[tuple[str, str, str | None]]:
+    """
+    Returns the column name, kind and `array` type code of each field in `keys`,
+    the field definitions of `Message._keys` or `message.generic.keys()`.
+    Kind is "number", "vector" (one column per component) or "bytes".
+    Repeated blocks are left out, they are tables of their own.
+    """
+    out = []
+    for name, impl in keys.items():
+        if isinstance(impl, tuple):
+            continue
+        if isinstance(impl, dict):
+            out.extend(columns(impl, f"{prefix}{name}."))
+        elif issubclass(impl, Variable1) or impl.format.endswith("s"):
+            out.append((prefix + name, "bytes", None))
+        elif (typecode := _typecode(impl)) is not None:
+            out.append((prefix + name, "number", typecode))
+        else:
+            code = impl.format.lstrip("<>!=@")
+            for axis in AXES[: len(code)]:
+                out.append((f"{prefix}{name}.{axis}", "vector", code[0]))
+    return out
+
+
+def _repeated(keys: dict) -> dict[str, dict]:
+    """Returns the fields of each repeated block in `keys`, by block name."""
+    return {name: impl[1] for name, impl in keys.items() if isinstance(impl, tuple)}
+
+
+def _flatten(values: dict, prefix: str = "") -> dict:
+    """Names single block values like `columns()`, leaving repeated blocks out."""
+    out = {}
+    for name, value in values.items():
+        if isinstance(value, Columns):
+            continue
+        if isinstance(value, dict):
+            out.update(_flatten(value, f"{prefix}{name}."))
+        else:
+            out[prefix + name] = value
+    return out
+
+
+class _batch:
+    """Rows of one table not written yet, as growing columns."""
+
+    __slots__ = ("columns", "specs", "rows")
+
+    def __init__(self, specs: list[tuple[str, str, str | None]]):
+        self.specs = specs
+        self.columns = {}
+        for name, kind, typecode in specs:
+            self.columns[name] = [] if kind == "bytes" else array(typecode)
+        self.rows = 0
+
+    def append(self, values: dict):
+        """Appends one row, named like `columns()`."""
+        out = self.columns
+        for name, kind, _ in self.specs:
+            if kind == "vector":
+                field, axis = name.rsplit(".", 1)
+                out[name].append(values[field][AXES.index(axis)])
+            else:
+                out[name].append(
+                    _bytes(values[name]) if kind == "bytes" else values[name]
+                )
+        self.rows += 1
+
+    def extend(self, block: Columns, time: float, message: int):
+        """Appends every entry of a repeated block at once."""
+        out = self.columns
+        out["time"].extend(array("d", [time]) * block.count)
+        out["message"].extend(array("Q", [message]) * block.count)
+        for name, kind, _ in self.specs[2:]:
+            if kind == "vector":
+                field, axis = name.rsplit(".", 1)
+                i = AXES.index(axis)
+                out[name].extend(value[i] for value in block[field])
+            elif kind == "bytes":
+                out[name].extend(map(_bytes, block[name]))
+            else:
+                out[name].extend(block[name])
+        self.rows += block.count
+
+
+def _bytes(value) -> bytes:
+    """Variable fields are `(length, bytes)` pairs, others are bytes already."""
+    return value[1] if isinstance(value, tuple) else value
+
+
+class exporter:
+    """
+    Writes decoded messages to `directory` in columns, see the module comment.
+    At most `pending` full batches wait for the writer thread, `add()` blocks beyond that.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        schema: dict | None = None,
+        batch: int = 10_000,
+        pending: int = 4,
+        format: str | None = None,
+    ):
+        """
+        `schema` is a parsed template, needed for `add()`.
+        `format` is "parquet", "npz" or "raw", the best installed one by default.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.schema = schema
+        self.batch = batch
+        self.format = format or ("parquet" if pyarrow else "npz" if numpy else "raw")
+        self._writer = _writers[self.format](directory)
+        self._keys: dict[str, dict] = {}  # Field definitions by message name.
+        self._batches: dict[str, _batch] = {}
+        self._rows: dict[str, int] = {}  # Rows of each table, written or not.
+        self._chunks: dict[str, int] = {}
+        self._queue = queue.Queue(pending)
+        self._error: Exception | None = None  # Raised by the writer thread.
+        self._thread = threading.Thread(
+            name="message_export_thread", target=self._write, daemon=True
+        )
+        self._thread.start()
+
+    def add(self, time: float, name: str, blocks: dict):
+        """Adds a message decoded by `message.generic`, as yielded by `dissect.decode()`."""
+        self._check()
+        if (keys := self._keys.get(name)) is None:
+            keys = self._keys[name] = generic.keys(self.schema[name])
+        self._add(time, name, keys, blocks)
+
+    def add_message(self, time: float, message: Message):
+        """Adds a message of a `message.body` class."""
+        self._check()
+        values = {key: data._data for key, data in message._data.items()}
+        self._add(time, type(message).__name__, message._keys, values)
+
+    def _add(self, time: float, name: str, keys: dict, values: dict):
+        table = self._table(name, keys)
+        row = self._rows.get(name, 0) + table.rows  # Referred to by its blocks.
+        flat = _flatten(values)
+        flat["time"] = time
+        table.append(flat)
+        self._full(name)
+        for block, fields in _repeated(keys).items():
+            self._table(f"{name}.{block}", fields).extend(values[block], time, row)
+            self._full(f"{name}.{block}")
+
+    def _table(self, name: str, keys: dict) -> _batch:
+        if (batch := self._batches.get(name)) is None:
+            specs = [("time", "number", "d")]
+            if "." in name:
+                specs.append(("message", "number", "Q"))
+            batch = self._batches[name] = _batch(specs + columns(keys))
+        return batch
+
+    def _full(self, name: str):
+        if self._batches[name].rows >= self.batch:
+            self._flush(name)
+
+    def _flush(self, name: str):
+        batch = self._batches.pop(name)
+        chunk = self._chunks.get(name, 0)
+        self._chunks[name] = chunk + 1
+        self._rows[name] = self._rows.get(name, 0) + batch.rows
+        self._queue.put((name, chunk, batch))
+
+    def close(self):
+        """Writes the remaining rows and waits for the writer thread."""
+        for name in list(self._batches):
+            self._flush(name)
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self):
+        """Raises the error that stopped the writer thread, if any."""
+        if self._error is not None:
+            raise self._error
+
+    def _write(self):
+        # After an error the queue is still drained, so `add()` and `close()` never block.
+        while (item := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self._writer.write(*item)
+                except Exception as e:
+                    self._error = e
+
+
+class _parquet:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files = {}
+
+    def write(self, name: str, chunk: int, batch: _batch):
+        arrays = {}
+        for column, kind, typecode in batch.specs:
+            values = batch.columns[column]
+            if kind == "bytes":
+                arrays[column] = pyarrow.array(values, pyarrow.binary())
+            else:
+                arrays[column] = pyarrow.array(values, _arrow_types[typecode])
+        table = pyarrow.table(arrays)
+        if (file := self.files.get(name)) is None:
+            path = os.path.join(self.directory, f"{name}.parquet")
+            file = self.files[name] = pyarrow.parquet.ParquetWriter(path, table.schema)
+        file.write_table(table)
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+_arrow_types = {}
+if pyarrow is not None:
+    # fmt: off
+    _arrow_types = {
+        "b": pyarrow.int8(),  "B": pyarrow.uint8(),
+        "h": pyarrow.int16(), "H": pyarrow.uint16(),
+        "i": pyarrow.int32(), "I": pyarrow.uint32(),
+        "l": pyarrow.int32(), "L": pyarrow.uint32(),
+        "q": pyarrow.int64(), "Q": pyarrow.uint64(),
+        "f": pyarrow.float32(), "d": pyarrow.float64(),
+    }
+    # fmt: on
+
+
+class _npz:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def write(self, name: str, chunk: int, batch: _batch):
+        arrays = {}
+        for column, kind, _ in batch.specs:
+            values = batch.columns[column]
+            if kind == "bytes":
+                data, offsets = _pack(values)
+                arrays[f"{column}.data"] = numpy.frombuffer(data, numpy.uint8)
+                arrays[f"{column}.offsets"] = numpy.frombuffer(offsets, numpy.uint64)
+            else:
+                arrays[column] = numpy.frombuffer(values, values.typecode)
+        numpy.savez(os.path.join(self.directory, f"{name}.{chunk:05}.npz"), **arrays)
+
+    def close(self):
+        pass
+
+
+class _raw:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def write(self, name: str, chunk: int, batch: _batch):
+        base = os.path.join(self.directory, f"{name}.{chunk:05}")
+        manifest = {"rows": batch.rows, "columns": []}
+        with open(base + ".bin", "wb") as file:
+            for column, kind, _ in batch.specs:
+                values = batch.columns[column]
+                if kind == "bytes":
+                    data, offsets = _pack(values)
+                    parts = (("offsets", offsets), ("data", array("B", data)))
+                else:
+                    parts = (("values", values),)
+                entry = {"name": column, "kind": kind}
+                for part, values in parts:
+                    entry[part] = {
+                        "typecode": values.typecode,
+                        "itemsize": values.itemsize,
+                        "offset": file.tell(),
+                        "count": len(values),
+                    }
+                    values.tofile(file)
+                manifest["columns"].append(entry)
+        with open(base + ".json", "w") as file:
+            json.dump(manifest, file, indent=1)
+
+    def close(self):
+        pass
+
+
+_writers = {"parquet": _parquet, "npz": _npz, "raw": _raw}
+
+
+def _pack(values: list[bytes]) -> tuple[bytes, array]:
+    """Byte strings as one buffer, and the start of each plus the end of the last."""
+    offsets = array("Q", [0])
+    end = 0
+    for value in values:
+        end += len(value)
+        offsets.append(end)
+    return b"".join(values), offsets
+
+
+def load(directory: str, table: str) -> dict[str, array | list[bytes]]:
+    """Reads every chunk of a table written in the raw format."""
+    out = {}
+    chunk = 0
+    while os.path.exists(
+        (base := os.path.join(directory, f"{table}.{chunk:05}")) + ".json"
+    ):
+        with open(base + ".json") as file:
+            manifest = json.load(file)
+        with open(base + ".bin", "rb") as file:
+            data = file.read()
+        for entry in manifest["columns"]:
+            parts = {}
+            for part in ("values", "offsets", "data"):
+                if (layout := entry.get(part)) is not None:
+                    start = layout["offset"]
+                    end = start + layout["count"] * layout["itemsize"]
+                    parts[part] = array(layout["typecode"], data[start:end])
+            if entry["kind"] == "bytes":
+                blob, offsets = parts["data"].tobytes(), parts["offsets"]
+                values = [blob[a:b] for a, b in zip(offsets, offsets[1:])]
+                out.setdefault(entry["name"], []).extend(values)
+            else:
+                out.setdefault(entry["name"], array(parts["values"].typecode))
+                out[entry["name"]].extend(parts["values"])
+        chunk += 1
+    return out
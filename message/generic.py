@@ -0,0 +1,169 @@
+from parser import template, zerocode
+
+from message.codec import Codec, Columns
+from message.view import View
+from message.data import (
+    F32,
+    F64,
+    S8,
+    S16,
+    S32,
+    S64,
+    U8,
+    U16,
+    U32,
+    U64,
+    Bool,
+    Bytes,
+    IPAddr,
+    IPPort,
+    Quaternion,
+    Uuid,
+    Variable1,
+    Variable2,
+    Vector,
+    Vector3d,
+    Vector4,
+)
+
+# Decodes any message described by `message_template.msg`,
+# without a hand-written class in `message.body`.
+
+types = {
+    "U8": U8,
+    "U16": U16,
+    "U32": U32,
+    "U64": U64,
+    "S8": S8,
+    "S16": S16,
+    "S32": S32,
+    "S64": S64,
+    "F32": F32,
+    "F64": F64,
+    "LLVector3": Vector,
+    "LLVector3d": Vector3d,
+    "LLVector4": Vector4,
+    "LLQuaternion": Quaternion,
+    "LLUUID": Uuid,
+    "BOOL": Bool,
+    "IPADDR": IPAddr,
+    "IPPORT": IPPort,
+}
+
+id_size = {"Fixed": 4, "Low": 4, "Medium": 2, "High": 1}
+
+
+def keys(message: template.Template) -> dict:
+    """Converts a message template into `Codec` keys, one entry per block."""
+    out = {}
+    for block in message.blocks:
+        fields = {}
+        for field in block.fields:
+            if field.type == "Variable":
+                fields[field.name] = Variable1 if field.size == 1 else Variable2
+            elif field.type == "Fixed":
+                fields[field.name] = Bytes.sized(field.size)
+            else:
+                fields[field.name] = types[field.type]
+        if block.kind == "Single":
+            out[block.name] = fields
+        elif block.kind == "Multiple":
+            out[block.name] = (block.count, fields)
+        else:
+            out[block.name] = (Variable1, fields)
+    return out
+
+
+def to_dict(message: template.Template, values: list) -> dict:
+    """Names decoded block values, repeated blocks stay `Columns` of their fields."""
+    out = {}
+    for block, value in zip(message.blocks, values):
+        if block.kind == "Single":
+            out[block.name] = dict(zip([field.name for field in block.fields], value))
+        else:
+            out[block.name] = value
+    return out
+
+
+class TemplateView(View):
+    """Blocks of a template message, decoded when accessed."""
+
+    __slots__ = ("template",)
+
+    def __init__(self, message: template.Template, codec: Codec, buffer, offset: int):
+        super().__init__(codec, buffer, offset)
+        self.template = message
+
+    def __getitem__(self, key: str) -> dict | Columns:
+        block = self.template.blocks[self.codec.index[key]]
+        value = self.raw(key)
+        if block.kind == "Single":
+            return dict(zip([field.name for field in block.fields], value))
+        return value
+
+    def materialize(self) -> dict:
+        """Returns every block, no longer referring to the received buffer."""
+        return to_dict(self.template, self.values())
+
+
+def message_number(data: bytes, offset: int) -> int:
+    """Reads an encoded message number from decoded body bytes."""
+    if data[offset] != 0xFF:
+        return data[offset] << 24
+    if data[offset + 1] != 0xFF:
+        return int.from_bytes(data[offset : offset + 2]) << 16
+    return int.from_bytes(data[offset : offset + 4])
+
+
+class Decoder:
+    """
+    Decodes messages of a parsed template schema.
+    Each message is compiled into a `Codec` the first time it is seen.
+    """
+
+    def __init__(self, schema: dict[str, template.Template]):
+        self.schema = schema
+        self._numbers = {x.number: x for x in schema.values()}
+        self._codecs = {}
+
+    def codec(self, number: int) -> tuple[template.Template, Codec]:
+        """Returns the template and compiled codec for an encoded message number."""
+        if (compiled := self._codecs.get(number)) is None:
+            message = self._numbers[number]
+            compiled = self._codecs[number] = (message, Codec(keys(message)))
+        return compiled
+
+    def _locate(self, data) -> tuple:
+        body = 6 + data[5]  # Skip extra header.
+        if data[0] & 0x80:  # Zerocoded
+            data, body = zerocode.decode(data[body:]), 0
+        message, compiled = self.codec(message_number(data, body))
+        return message, compiled, data, body + id_size[message.frequency]
+
+    def decode(self, data: bytes) -> tuple[str, dict]:
+        """
+        Expects bytes from the beginning of the packet.
+        Returns the message name and its blocks decoded according to the template.
+        """
+        message, compiled, data, offset = self._locate(data)
+        values, _ = compiled.decode(data, offset)
+        return message.name, to_dict(message, values)
+
+    def view(self, data) -> tuple[str, TemplateView]:
+        """
+        Expects bytes from the beginning of the packet.
+        Returns the message name and a view that decodes blocks on first access.
+        """
+        message, compiled, data, offset = self._locate(data)
+        return message.name, TemplateView(message, compiled, data, offset)
+
+
+_decoder = None
+
+
+def decode(data: bytes) -> tuple[str, dict]:
+    """Decodes a packet using `message_template.msg`."""
+    global _decoder
+    if _decoder is None:
+        _decoder = Decoder(template.schema)
+    return _decoder.decode(data)
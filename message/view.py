@@ -0,0 +1,84 @@
+from parser import zerocode
+
+from message.body import Message
+from message.codec import Codec
+from message.data import *
+
+# Views decode fields on first access instead of unpacking the whole message.
+# Unencoded messages are read straight from a `memoryview` of the received buffer,
+# so a view must be materialized before that buffer is reused.
+
+
+class View:
+    """
+    Lazily decoded fields of a `Codec` over a buffer.
+    Fields before the requested one are skipped by their size, not decoded.
+    """
+
+    __slots__ = ("codec", "buffer", "_offsets", "_values")
+
+    def __init__(self, codec: Codec, buffer, offset: int = 0):
+        self.codec = codec
+        self.buffer = memoryview(buffer)
+        self._offsets = [offset]  # Known start of each field, in order.
+        self._values = {}
+
+    def raw(self, key: str):
+        """Returns the unpacked value of a field, decoding it on first access."""
+        i = self.codec.index[key]
+        if i in self._values:
+            return self._values[i]
+        offsets, fields, buffer = self._offsets, self.codec.fields, self.buffer
+        while len(offsets) <= i:
+            offsets.append(fields[len(offsets) - 1][1](buffer, offsets[-1]))
+        value, end = fields[i][0](buffer, offsets[i])
+        if len(offsets) == i + 1:
+            offsets.append(end)
+        self._values[i] = value
+        return value
+
+    def values(self) -> list:
+        """Returns every unpacked value in field order."""
+        return [self.raw(key) for key in self.codec.names]
+
+
+class MessageView(View):
+    """Read-only `Message` whose fields are decoded when accessed."""
+
+    __slots__ = ("_cls",)
+
+    def __init__(self, cls: type[Message], buffer, offset: int = 0):
+        super().__init__(cls._codec, buffer, offset)
+        self._cls = cls
+
+    def data(self, key: str):
+        """Returns the underlying object being stored."""
+        impl = self._cls._keys[key]
+        if isinstance(impl, tuple):
+            return Block(self.raw(key))
+        return impl(self.raw(key))
+
+    def __getitem__(self, key: str):
+        """Returns a textual representation of the stored value."""
+        if key not in self._cls._keys:
+            raise KeyError(f"Key '{key}' not in {', '.join(self._cls._keys)}")
+        return self.data(key).value
+
+    def materialize(self) -> Message:
+        """Returns a `Message` that no longer refers to the received buffer."""
+        message = self._cls()
+        for key in self._cls._keys:
+            message._data[key] = self.data(key)
+        return message
+
+
+@classmethod
+def _view(cls: Message, data) -> MessageView:
+    """Wraps packet bytes without decoding any fields yet."""
+    body_byte = 6
+    if cls._zerocoded:
+        return MessageView(cls, zerocode.decode(data[body_byte:]), cls._frequency)
+    return MessageView(cls, data, body_byte + cls._frequency)
+
+
+Message.view = _view
@@ -1,6 +1,11 @@
 # Relative imports
 from .packet import *
 from .types import *
+from .pool import LoginError, login_pool
+from .circuit import *
+from .dispatch import *
+from .trace import *
+from .capture import INBOUND, OUTBOUND, recorder
 
 fixed = Fixed()
 low = Low()
@@ -0,0 +1,133 @@
+import struct
+
+import packet
+
+# Received reliable packets are acknowledged in batches instead of one PacketAck each.
+# Pending ACKs ride along on outgoing packets when there is room (`ACKNOWLEDGE` flag):
+# big-endian sequence numbers appended after the body, followed by a 1-byte count.
+
+MTU = 1200  # Largest packet the region accepts.
+MAX_ACKS = 255  # Per PacketAck block, and per appended list.
+SEQUENCE_WRAP = 1 << 24  # Regions wrap sequence numbers here, 2**32 is a multiple.
+
+
+class ack_queue:
+    """Sequence numbers of received reliable packets that still need an ACK."""
+
+    def __init__(self):
+        self.pending: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, sequence: int):
+        self.pending.append(sequence)
+
+    def take(self, limit: int = MAX_ACKS) -> list[int]:
+        """Removes and returns up to `limit` pending sequence numbers."""
+        taken = self.pending[:limit]
+        del self.pending[:limit]
+        return taken
+
+    def packet_ack(self, sequence: int) -> bytes | None:
+        """Returns one PacketAck packet for up to 255 pending ACKs, or None."""
+        acks = self.take()
+        if not acks:
+            return None
+        return b"".join(
+            (
+                packet.header(packet.PacketAck, sequence),
+                struct.pack(f"<B{len(acks)}L", len(acks), *acks),
+            )
+        )
+
+    def _fitting(self, size: int) -> list[int]:
+        """Takes as many ACKs as fit in the MTU after a packet of `size` bytes."""
+        room = min((MTU - size - 1) // 4, MAX_ACKS)
+        return self.take(room) if room > 0 else []
+
+    def append_to(self, data: bytearray) -> int:
+        """
+        Appends as many pending ACKs as fit in the MTU to an outgoing packet.
+        Returns the number appended.
+        """
+        if acks := self._fitting(len(data)):
+            data += struct.pack(f">{len(acks)}LB", *acks, len(acks))
+            data[0] |= packet.ACKNOWLEDGE
+        return len(acks)
+
+    def pack_into(self, buffer: bytearray, end: int) -> int:
+        """
+        Like `append_to()`, for a packet ending at `end` in a larger send buffer.
+        Returns the new end of the packet.
+        """
+        if acks := self._fitting(end):
+            struct.pack_into(f">{len(acks)}LB", buffer, end, *acks, len(acks))
+            buffer[0] |= packet.ACKNOWLEDGE
+            end += len(acks) * 4 + 1
+        return end
+
+
+def split_acks(data: bytes) -> tuple[bytes, tuple[int, ...]]:
+    """
+    Expects bytes from the beginning of the packet.
+    Returns the packet without appended ACKs, and the acknowledged sequence numbers.
+    """
+    if not data[0] & packet.ACKNOWLEDGE:
+        return data, ()
+    count = data[-1]
+    end = len(data) - 1 - 4 * count
+    if end < packet.BODY_BYTE:
+        return data, ()  # Malformed, leave it to the message decoder.
+    return data[:end], struct.unpack_from(f">{count}L", data, end)
+
+
+def filter_received(
+    data: bytes, window: "duplicate_window"
+) -> tuple[bytes, tuple[int, ...], bool]:
+    """
+    Expects bytes from the beginning of a received packet.
+    Returns the packet without appended ACKs, the acknowledged sequence numbers,
+    and whether it is a reliable packet already recorded in `window`.
+    """
+    if len(data) <= packet.BODY_BYTE:
+        return data, (), False
+    data, acks = split_acks(data)
+    duplicate = bool(data[0] & packet.RELIABLE) and window.seen(
+        int.from_bytes(data[1:5])
+    )
+    return data, acks, duplicate
+
+
+class duplicate_window:
+    """
+    Remembers the last `size` sequence numbers received as a bitmap,
+    so resent reliable packets that were already handled can be dropped.
+    Sequence numbers are compared modulo `SEQUENCE_WRAP`, so the window survives a wrap.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.mask = (1 << size) - 1
+        self.highest = None
+        self.bits = 0  # Bit N set means `highest - N` was received.
+
+    def seen(self, sequence: int) -> bool:
+        """Records a sequence number, returning True if it was already received."""
+        if self.highest is None:
+            ahead = self.size
+        else:
+            ahead = (sequence - self.highest) % SEQUENCE_WRAP
+        if 0 < ahead < SEQUENCE_WRAP // 2:
+            shift = min(ahead, self.size)  # Any gap beyond the window clears it.
+            self.bits = ((self.bits << shift) | 1) & self.mask
+            self.highest = sequence
+            return False
+        offset = -ahead % SEQUENCE_WRAP
+        if offset >= self.size:
+            return False  # Too old to tell, let it through.
+        bit = 1 << offset
+        if self.bits & bit:
+            return True
+        self.bits |= bit
+        return False
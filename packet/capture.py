@@ -0,0 +1,104 @@
+import mmap
+import struct
+import time
+from typing import Callable, Iterator
+
+from .acks import duplicate_window, filter_received
+
+# Capture files hold every datagram of a circuit, for profiling and regression tests.
+# After an 8-byte magic, each record is a little-endian header followed by the payload:
+# f64 `time.time()` timestamp, u8 direction, u16 payload length.
+
+MAGIC = b"SLCAP\x00\x01\x00"  # Format version 1.
+INBOUND = 0
+OUTBOUND = 1
+
+_record = struct.Struct("<dBH")
+
+
+class recorder:
+    """Appends datagrams to a capture file, set as `client.capture` to record a circuit."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, direction: int, data: bytes):
+        self.file.write(_record.pack(self.clock(), direction, len(data)))
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path: str) -> Iterator[tuple[float, int, bytes]]:
+    """
+    Yields the timestamp, direction and payload of each record.
+    The file is memory-mapped, only the records being yielded are copied.
+    """
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        offset, end = len(MAGIC), len(data)
+        while offset + _record.size <= end:
+            timestamp, direction, size = _record.unpack_from(data, offset)
+            offset += _record.size
+            if offset + size > end:
+                break  # Cut short while recording.
+            yield timestamp, direction, data[offset : offset + size]
+            offset += size
+
+
+def replay(
+    path: str,
+    handle: Callable[[bytes], object],
+    direction: int = INBOUND,
+    realtime: bool = False,
+    speed: float = 1.0,
+) -> int:
+    """
+    Feeds the datagrams of one direction to `handle`, until it returns False.
+    As a circuit receives them: without appended ACKs, and resent duplicates dropped.
+    As fast as possible by default, or at the recorded pace (scaled by `speed`).
+    Returns the number of datagrams handled.
+    """
+    count = 0
+    start = first = None
+    window = duplicate_window()
+    for timestamp, kind, data in read(path):
+        if kind != direction:
+            continue
+        data, _, duplicate = filter_received(data, window)
+        if duplicate:
+            continue
+        if realtime:
+            if first is None:
+                start, first = time.monotonic(), timestamp
+            delay = (timestamp - first) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        count += 1
+        if handle(data) is False:
+            break
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    import packet
+
+    for timestamp, direction, data in read(sys.argv[1]):
+        arrow = "<-" if direction == INBOUND else "->"
+        print(f"{timestamp:.6f} {arrow} {packet.human_header(data)}")
@@ -0,0 +1,251 @@
+import asyncio
+import weakref
+from socket import AF_INET, SOCK_DGRAM, socket
+
+import packet
+
+from .acks import MAX_ACKS, ack_queue, duplicate_window, filter_received
+from .packet import client, receive_ring, send_buffer
+from .pool import login_pool
+from .reliable import is_packet_ack, parse_packet_ack, reliability
+
+# Sends copy into the buffer and return before another circuit can send,
+# so the circuits of one event loop share a single send buffer.
+_buffers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+# asyncio UDP client and connection/circuit manager
+class circuit(client, asyncio.DatagramProtocol):
+    """
+    Interface for communicating with a region in Second Life, on an asyncio event loop.
+    Sending is immediate, receiving is awaited without blocking other tasks.
+    Reliable packets are resent until acknowledged, see `send_reliable()`.
+    Received reliable packets are acknowledged in batches, see `acknowledge()`,
+    and resent copies of them are dropped before reaching `receive()`.
+    """
+
+    ack_delay = 0.1  # Longest time an ACK waits for an outgoing packet to ride on.
+
+    def __init__(self):
+        self.transport = None
+        self.reliable = reliability(self._sendto)
+        self.acks = ack_queue()
+        self.window = duplicate_window()
+        self.buffer: send_buffer | None = (
+            None  # Shared per event loop, see `connect()`.
+        )
+        self.ring = receive_ring()
+        self.udp = None
+        self._reader = None  # Duplicate of the transport's socket.
+        self._oldest = 0  # Ring count of the oldest datagram queued or held.
+        self._ack_flush = None
+        self._received = asyncio.Queue()
+        self._retransmit = None
+        self._tracked = asyncio.Event()  # Wakes `retransmit()` for new packets.
+
+    # asyncio.DatagramProtocol
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        self._retransmit = asyncio.get_running_loop().create_task(self.retransmit())
+
+    def datagram_received(self, data: bytes, addr: tuple):
+        self._receive(data, self.ring.count)
+
+    def _receive(self, data: bytes | memoryview, number: int):
+        """Queues a datagram for `receive()`, `number` is its place in the `ring`."""
+        if self.capture is not None:
+            self.capture.write(packet.INBOUND, data)
+        if len(data) > packet.BODY_BYTE:
+            data, acks, duplicate = filter_received(data, self.window)
+            for sequence in acks:
+                self.reliable.acknowledge(sequence)
+            if data[0] & packet.RELIABLE:
+                # Duplicates too, our first ACK was lost.
+                self.acknowledge(int.from_bytes(data[1:5]))
+            if duplicate:
+                return
+            if is_packet_ack(data):
+                for sequence in parse_packet_ack(data):
+                    self.reliable.acknowledge(sequence)
+        self._received.put_nowait((number, data))
+
+    def error_received(self, exc: Exception):
+        pass  # ICMP errors; UDP keeps going.
+
+    def _read_ready(self):
+        """
+        Replaces the transport's reader, which receives one new bytes object per wakeup.
+        Drains every ready datagram into the `ring`, then handles them in order.
+        """
+        # Slots from the oldest datagram queued or held by `receive()` on are in use,
+        # including those of dropped duplicates in between. Copies take no slot.
+        free = self.ring.slots - (self.ring.count - self._oldest)
+        start = self.ring.count
+        try:
+            if free > 0:
+                batch = self.ring.drain(self._reader, free)
+            else:
+                batch = [self._reader.recv(self.ring.size)]
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self.error_received(e)
+            return
+        for number, data in enumerate(batch, start):
+            self._receive(data, number)
+
+    def connection_lost(self, exc: Exception | None):
+        self.transport = None
+        if self._reader is not None:
+            asyncio.get_running_loop().remove_reader(self._reader.fileno())
+            self._reader.close()
+            self._reader = None
+        if self._retransmit is not None:
+            self._retransmit.cancel()
+        if self._ack_flush is not None:
+            self._ack_flush.cancel()
+        for entry in self.reliable.pending.values():
+            if entry.callback is not None:
+                entry.callback(False)
+        self.reliable.pending.clear()
+        self._received.put_nowait(
+            (self.ring.count, b"")
+        )  # Ends `while data := await receive()`
+
+    # Circuit
+
+    def send(self, *args):
+        """
+        Sends UDP data to connected region, assembled in the reused `buffer`.
+        **Requires `login()` to be awaited first.**
+        """
+        self.sequence += 1
+        end = self.buffer.fill(args)
+        if self.acks:
+            end = self.acks.pack_into(self.buffer.data, end)
+        data = self.buffer.view(end)  # The transport copies it if it must queue.
+        if self.capture is not None:
+            self.capture.write(packet.OUTBOUND, data)
+        return self.transport.sendto(data)
+
+    def acknowledge(self, sequence: int):
+        """
+        Queues an ACK for a received reliable packet.
+        It is appended to the next outgoing packet, or sent in a PacketAck after `ack_delay`.
+        """
+        self.acks.add(sequence)
+        if len(self.acks) >= MAX_ACKS:
+            self.flush_acks()
+        elif self._ack_flush is None:
+            loop = asyncio.get_running_loop()
+            self._ack_flush = loop.call_later(self.ack_delay, self.flush_acks)
+
+    def flush_acks(self):
+        """Sends every pending ACK in as few PacketAck packets as possible."""
+        if self._ack_flush is not None:
+            self._ack_flush.cancel()
+            self._ack_flush = None
+        while self.transport is not None and (
+            data := self.acks.packet_ack(self.sequence)
+        ):
+            self.sequence += 1
+            self._sendto(data)
+
+    def send_reliable(self, *args) -> asyncio.Future:
+        """
+        Sends UDP data with the `RELIABLE` flag and resends it until acknowledged.
+        The returned future resolves to True once delivered, or False when given up.
+        """
+        data = bytearray(b"".join(args))
+        data[0] |= packet.RELIABLE
+        self.send(data)  # Appended ACKs are not tracked, so resends leave them out.
+        delivered = asyncio.get_running_loop().create_future()
+
+        def done(success: bool):
+            if not delivered.done():
+                delivered.set_result(success)
+
+        self.reliable.track(data, done)
+        self._tracked.set()
+        return delivered
+
+    def _sendto(self, data: bytes):
+        if self.transport is not None:
+            if self.capture is not None:
+                self.capture.write(packet.OUTBOUND, data)
+            self.transport.sendto(data)
+
+    async def retransmit(self):
+        """
+        Resends expired reliable packets for as long as the circuit is open.
+        Sleeps until the earliest timeout, or until a reliable packet is sent.
+        """
+        while True:
+            self._tracked.clear()
+            deadline = self.reliable.next_deadline()
+            if deadline is None:
+                await self._tracked.wait()
+                continue
+            try:
+                delay = deadline - self.reliable.clock()
+                await asyncio.wait_for(self._tracked.wait(), max(delay, 0))
+            except TimeoutError:
+                pass
+            self.reliable.resend_expired()
+
+    async def receive(self) -> bytes | memoryview:
+        """
+        Waits for the next UDP datagram from the region. Returns `b""` once closed.
+        A datagram in the receive `ring` is valid until `receive()` is called again.
+        **Requires `login()` to be awaited first.**
+        """
+        if self._received.empty():
+            self._oldest = self.ring.count  # The held datagram is released.
+        self._oldest, data = await self._received.get()
+        return data
+
+    async def login(
+        self, first: str, last: str, password: str, pool: login_pool | None = None
+    ):
+        """
+        Signs into Second Life and opens a UDP endpoint with a region.
+        Agents of one `pool` share its connections to the login server.
+        """
+        params = self.login_params(first, last, password)
+        if pool is not None:
+            self.login_response = await pool.login(params)
+        else:
+            pool = login_pool(self._login_uri, connections=1)
+            try:
+                self.login_response = await pool.login(params)
+            finally:
+                pool.close()
+        self.open_circuit(self.login_response)
+        await self.connect()
+        return self.login_response
+
+    async def connect(self):
+        """Opens the UDP endpoint after `open_circuit()`."""
+        loop = asyncio.get_running_loop()
+        if self.buffer is None:
+            if (buffer := _buffers.get(loop)) is None:
+                buffer = _buffers[loop] = send_buffer()
+            self.buffer = buffer
+        self.udp = socket(AF_INET, SOCK_DGRAM)
+        self.udp.setblocking(False)
+        self.udp.connect((self.udp_host, self.udp_port))
+        await loop.create_datagram_endpoint(lambda: self, sock=self.udp)
+        # The transport owns its descriptor, so `_read_ready` watches a duplicate.
+        reader = self.udp.dup()
+        try:
+            loop.add_reader(reader.fileno(), self._read_ready)
+        except NotImplementedError:
+            reader.close()  # Proactor loops read for us, one datagram at a time.
+            return
+        self.transport.pause_reading()
+        self._reader = reader
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
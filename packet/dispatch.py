@@ -0,0 +1,84 @@
+import parser.template as template
+from typing import Callable
+
+import packet
+
+# Handlers are registered by message name, but looked up by encoded message number,
+# so dispatching a packet costs one dictionary lookup however many handlers exist.
+# Names are resolved on first dispatch, the template need not be loaded to register.
+# Handlers get the `packet_header` parsed for dispatching, message fields start at
+# `header.body[header.offset]`, so the header is not parsed or decoded again.
+
+Handler = Callable[[packet.packet_header], object]
+
+
+class dispatcher:
+    """
+    Calls the handlers registered for a packet's message.
+    Packets without a handler go to `default`, if set.
+    A handler returning False ends the connection, see `dispatch()`.
+    """
+
+    def __init__(self, table: dict | None = None):
+        # Bidirectional names and numbers, `template.message` by default.
+        self._table = table
+        self.handlers: dict[int, list[Handler]] = {}
+        self._pending: list[tuple[str, Handler]] = []  # Registered, not yet resolved.
+        self.default: Handler | None = None
+
+    @property
+    def table(self) -> dict:
+        if self._table is None:
+            self._table = template.message
+        return self._table
+
+    def number(self, name: str) -> int:
+        """Resolves a message name to its encoded number."""
+        try:
+            return self.table[name]
+        except KeyError:
+            raise KeyError(f"Unknown message '{name}'") from None
+
+    def on(self, name: str, handler: Handler | None = None):
+        """
+        Registers a handler for a message, usable as a decorator.
+        Several handlers of one message are called in registration order.
+        """
+        if handler is None:
+            return lambda handler: self.on(name, handler)
+        self._pending.append((name, handler))
+        return handler
+
+    def resolve(self):
+        """Resolves registered message names to numbers, raising for unknown names."""
+        pending, self._pending = self._pending, []
+        for name, handler in pending:
+            self.handlers.setdefault(self.number(name), []).append(handler)
+
+    def off(self, name: str, handler: Handler):
+        """Unregisters a handler."""
+        self.resolve()
+        number = self.number(name)
+        self.handlers[number].remove(handler)
+        if not self.handlers[number]:
+            del self.handlers[number]
+
+    def dispatch(self, header: packet.packet_header | bytes) -> bool:
+        """
+        Expects a parsed header, or bytes from the beginning of the packet.
+        Returns False if any handler returned False.
+        """
+        if self._pending:
+            self.resolve()
+        if not isinstance(header, packet.packet_header):
+            header = packet.parse_header(header)
+        handlers = self.handlers.get(header.number)
+        if handlers is None:
+            if self.default is not None:
+                return self.default(header) is not False
+            return True
+        keep = True
+        for handler in handlers:
+            if handler(header) is False:
+                keep = False
+        return keep
@@ -1,4 +1,5 @@
 import builtins
+import functools
 import parser.zerocode as zerocode  # local
 import struct
 from hashlib import md5
@@ -8,6 +9,8 @@ from xmlrpc.client import ServerProxy
 
 import packet
 
+from .response import transport as _login_transport
+
 
 def is_zerocoded(input: bytes) -> builtins.bool:
     """Expects bytes from the beginning of the packet."""
@@ -29,42 +32,254 @@ def is_acknowledge(input: bytes) -> builtins.bool:
     return builtins.bool(input[0] & packet.ACKNOWLEDGE)
 
 
+_header = struct.Struct(">BLB")
+
+
 # Utility functions
 def header(message: int, sequence: int, flags=0, extra_byte=0, extra_header=None):
     """Create a byte sequence for a packet header."""
-    out = bytearray(struct.pack(">BLB", flags, sequence, extra_byte))
+    out = _header.pack(flags, sequence, extra_byte)
     if extra_header is not None:
         if extra_byte != len(header := bytes(extra_header)):
             raise Exception("Extra byte does not match extra header size.")
-        out.extend(header)
+        out += header
+    return out + _message_id(message, flags & packet.ZEROCODED)
+
+
+@functools.cache
+def _message_id(message: int, zerocoded: int) -> bytes:
+    """The encoded message number, packed once per message and encoding."""
     if (message & packet.low) == packet.low:
-        out.extend(struct.pack(">L", message))
+        id = struct.pack(">L", message)
     elif (message & packet.medium) == packet.medium:
-        out.extend(struct.pack(">H", message >> 16))
+        id = struct.pack(">H", message >> 16)
     elif (message & packet.high) == packet.high:
-        out.extend(struct.pack(">B", message >> 24))
+        id = struct.pack(">B", message >> 24)
     else:
         raise Exception(f'Unexpected value in "message" arg. ({message})')
-    return bytes(out)
+    # The message number is part of the zerocoded body, Low numbers contain a zero.
+    return zerocode.encode(id) if zerocoded else id
 
 
-def human_header(input: bytes) -> str:
+class send_buffer:
+    """
+    A preallocated buffer that outgoing datagrams are assembled in, reused by every send.
+    Sending a `view()` of it avoids joining the arguments into a new bytes object.
+    """
+
+    __slots__ = ("data", "_view")
+
+    def __init__(self, size: int = 64 * 1024):
+        self.data = bytearray(size)  # Never resized, `_view` exports it.
+        self._view = memoryview(self.data)
+
+    def fill(self, args) -> int:
+        """Copies `args` to the start of the buffer and returns the end offset."""
+        data, end = self.data, 0
+        for arg in args:
+            start, end = end, end + len(arg)
+            if end > len(data):
+                raise ValueError(f"Datagram larger than the send buffer ({len(data)})")
+            data[start:end] = arg
+        return end
+
+    def view(self, end: int) -> memoryview:
+        """The datagram, only valid until the next `fill()`."""
+        return self._view[:end]
+
+
+class receive_ring:
+    """
+    Preallocated buffers that datagrams are received into with `recv_into`, in turn.
+    A received datagram is a memoryview of its slot, valid for `slots - 1` more receives.
+    """
+
+    __slots__ = ("slots", "size", "count", "_view", "_next")
+
+    def __init__(self, slots: int = 8, size: int = 2048):
+        self.slots = slots
+        self.size = size  # Largest datagram, regions stay within the 1500 byte MTU.
+        self.count = 0  # Datagrams received, the Nth went into slot `N % slots`.
+        self._view = memoryview(bytearray(slots * size))
+        self._next = 0
+
+    def receive(self, sock: socket) -> memoryview:
+        """Receives one datagram into the next slot, as `sock.recv()` would."""
+        start = self._next * self.size
+        slot = self._view[start : start + self.size]
+        size = sock.recv_into(slot)
+        self._next = (self._next + 1) % self.slots
+        self.count += 1
+        return slot[:size]
+
+    def drain(self, sock: socket, limit: int) -> list[memoryview]:
+        """
+        Receives up to `limit` datagrams from a non-blocking socket, until none are ready.
+        Errors are raised only if nothing was received before them.
+        """
+        out = []
+        while len(out) < limit:
+            try:
+                out.append(self.receive(sock))
+            except BlockingIOError:
+                break
+            except OSError:
+                if not out:
+                    raise
+                break
+        return out
+
+
+_sequence = struct.Struct(">L")
+
+
+class prebuilt:
     """
-    Converts bytes into formatted string `'[123] {Low 123} +123 Resent Reliable Encoded Acknowledge'`
+    A datagram packed once per session for messages whose contents rarely change.
+    Sending patches the sequence number and any `counter()` fields in place.
+    Not for zerocoded messages, their field offsets move with the contents.
     """
-    flags = input[0]
-    sequence = int.from_bytes(input[1:5])
-    extra = input[5]
-    (mID, mHZ) = human_message(input)
 
-    out = "".join(f"[{sequence}] ({mHZ} {mID}) +{extra}")
+    __slots__ = ("data", "fields")
+
+    def __init__(self, message: int, *args: bytes, flags=0):
+        self.data = bytearray(header(message, 0, flags))
+        self.fields = {}  # Name to offset and struct of patched fields.
+        self.append(*args)
+
+    def append(self, *args) -> "prebuilt":
+        """Appends constant bytes, or alternating format and value as in `pack_sequence()`."""
+        if args and not isinstance(args[0], (bytes, bytearray)):
+            args = (pack_sequence(*args),)
+        for arg in args:
+            self.data += arg
+        return self
+
+    def counter(self, name: str, format, value=0) -> "prebuilt":
+        """Appends a field that can be changed on each send, such as a GenCounter."""
+        codec = struct.Struct(str(format))
+        self.fields[name] = (len(self.data), codec)
+        self.data += codec.pack(value)
+        return self
+
+    def __call__(self, sequence: int, **fields) -> bytearray:
+        """Returns the datagram with `sequence` and `fields` patched in, reused by the next call."""
+        data = self.data
+        _sequence.pack_into(data, 1, sequence)
+        for name, value in fields.items():
+            offset, codec = self.fields[name]
+            codec.pack_into(data, offset, value)
+        return data
+
+
+class packet_header:
+    """
+    Header fields of a received packet, parsed once by `parse_header()`.
+    Message fields start at `body[offset]`, zerocoded bodies are decoded on first access.
+    """
+
+    __slots__ = (
+        "data",
+        "flags",
+        "sequence",
+        "extra",
+        "number",
+        "id",
+        "frequency",
+        "offset",
+        "_body",
+    )
+
+    def __init__(
+        self,
+        data: bytes,
+        flags: int,
+        sequence: int,
+        extra: int,
+        number: int,
+        id: int,
+        frequency: str,
+        offset: int,
+    ):
+        self.data = data
+        self.flags = flags
+        self.sequence = sequence
+        self.extra = extra  # Extra header length.
+        self.number = number  # Encoded message number, as used by `header()`.
+        self.id = id
+        self.frequency = frequency
+        self.offset = offset
+        self._body = None if flags & packet.ZEROCODED else data
+
+    @property
+    def body(self) -> bytes:
+        """The packet for unencoded messages, the decoded body after the extra header otherwise."""
+        if self._body is None:
+            self._body = zerocode.decode(self.data[packet.BODY_BYTE + self.extra :])
+        return self._body
+
+    @property
+    def reliable(self) -> builtins.bool:
+        return builtins.bool(self.flags & packet.RELIABLE)
+
+    @property
+    def resent(self) -> builtins.bool:
+        return builtins.bool(self.flags & packet.RESENT)
+
+    @property
+    def zerocoded(self) -> builtins.bool:
+        return builtins.bool(self.flags & packet.ZEROCODED)
+
+    @property
+    def acknowledge(self) -> builtins.bool:
+        return builtins.bool(self.flags & packet.ACKNOWLEDGE)
+
+    def __str__(self) -> str:
+        """Formatted as `'[123] (Low 123) +0 Resent Reliable Encoded Acknowledge'`"""
+        out = f"[{self.sequence}] ({self.frequency} {self.id}) +{self.extra}"
+        flags = self.flags
+        # fmt: off
+        if flags & packet.RESENT:      out += " Resent"
+        if flags & packet.RELIABLE:    out += " Reliable"
+        if flags & packet.ZEROCODED:   out += " Encoded"
+        if flags & packet.ACKNOWLEDGE: out += " Acknowledge"
+        # fmt: on
+        return out
+
+
+def parse_header(input: bytes) -> packet_header:
+    """
+    Expects bytes from the beginning of the packet.
+    Reads flags, sequence, extra header and message number in one pass.
+    """
+    flags, sequence, extra = _header.unpack_from(input)
+    start = packet.BODY_BYTE + extra
+    if flags & packet.ZEROCODED:
+        prefix, offset = zerocode.decode_prefix(input, 4, start), 0
+    else:
+        prefix, offset = input[start : start + 4], start
+
     # fmt: off
-    if flags & packet.RESENT:      out += " Resent"
-    if flags & packet.RELIABLE:    out += " Reliable"
-    if flags & packet.ZEROCODED:   out += " Encoded"
-    if flags & packet.ACKNOWLEDGE: out += " Acknowledge"
+    if not prefix:          raise ValueError("Packet has no message number")
+    if prefix[0] != 0xFF:   number, id, frequency, size = prefix[0] << 24, prefix[0], "High", 1
+    elif prefix[1] != 0xFF: number, id, frequency, size = (0xFF00 | prefix[1]) << 16, prefix[1], "Medium", 2
+    else:
+        number, size = int.from_bytes(prefix[:4]), 4
+        if number >= 0xFFFFFFFA: id, frequency = number, "Fixed"
+        else:                    id, frequency = number & 0xFFFF, "Low"
     # fmt: on
-    return out
+    if len(prefix) < size:
+        raise ValueError(f"Message number needs {size} bytes, got {len(prefix)}")
+    return packet_header(
+        input, flags, sequence, extra, number, id, frequency, offset + size
+    )
+
+
+def human_header(input: bytes) -> str:
+    """
+    Converts bytes into formatted string `'[123] (Low 123) +0 Resent Reliable Encoded Acknowledge'`
+    """
+    return str(parse_header(input))
 
 
 def sequence_number(input: bytes) -> int:
@@ -80,9 +295,9 @@ def message_number(input: bytes) -> int:
     """
     encoded = is_zerocoded(input)
     input = (
-        zerocode.decode(input[packet.BODY_BYTE :])
+        zerocode.decode_prefix(input, 4, packet.BODY_BYTE)
         if encoded
-        else input[packet.BODY_BYTE :]
+        else input[packet.BODY_BYTE : packet.BODY_BYTE + 4]
     )
 
     # fmt: off
@@ -101,9 +316,9 @@ def human_message(input: bytes) -> tuple[int, str]:
     """
     encoded = is_zerocoded(input)
     input = (
-        input[packet.BODY_BYTE :]
+        input[packet.BODY_BYTE : packet.BODY_BYTE + 4]
         if not encoded
-        else zerocode.decode(input[packet.BODY_BYTE :])
+        else zerocode.decode_prefix(input, 4, packet.BODY_BYTE)
     )
 
     # fmt: off
@@ -151,6 +366,7 @@ def unpack_sequence(buffer, *args) -> list:
                     out.append(b"")
                     last_val = None
                     continue
+                values = struct.unpack_from(format, buffer, offset)
             elif format in ["<B*s", "<H*s"]:
                 values = unpack_variable(buffer, format, offset)
                 format = format.replace("*", str(values[0]))
@@ -189,6 +405,9 @@ def pack_sequence(*args) -> bytes:
     return bytes(out)
 
 
+_sendmsg = hasattr(socket, "sendmsg")
+
+
 # UDP client and connection/circuit manager
 class client:
     """
@@ -196,28 +415,47 @@ class client:
     """
 
     _login_uri = "https://login.agni.lindenlab.com/cgi-bin/login.cgi"
-    _login_proxy = ServerProxy(_login_uri)
+    _login_proxy = ServerProxy(_login_uri, transport=_login_transport(_login_uri))
+    capture = None  # A `packet.recorder` to log every datagram to a capture file.
 
     def send(self, *args):
         """
-        Sends UDP data to connected socket.
+        Sends UDP data to connected socket, gathered from the arguments without joining.
         **Requires `login()` to be called first.**
         """
         self.sequence += 1
-        return self.udp.send(b"".join(args))
+        if self.capture is not None:
+            self.capture.write(packet.OUTBOUND, b"".join(args))
+        if _sendmsg:
+            return self.udp.sendmsg(args)
+        return self.udp.send(b"".join(args))  # Windows has no scatter-gather.
 
-    def receive(self):
+    def receive(self) -> memoryview:
         """
-        Receives UDP data to connected socket.
+        Receives UDP data to connected socket, into the reused `ring` of buffers.
         **Requires `login()` to be called first.**
         """
-        return self.udp.recv(1024 * 64)
+        data = self.ring.receive(self.udp)
+        if self.capture is not None:
+            self.capture.write(packet.INBOUND, data)
+        return data
 
     def login(self, first: str, last: str, password: str):
         """
         Signs into Second Life and establishes a UDP connection with a region.
         """
-        params = {
+        params = self.login_params(first, last, password)
+        self.login_response = self._login_proxy.login_to_simulator(params)
+        self.open_circuit(self.login_response)
+        self.udp = socket(AF_INET, SOCK_DGRAM)
+        self.udp.connect((self.udp_host, self.udp_port))
+        self.ring = receive_ring()
+        return self.login_response
+
+    @staticmethod
+    def login_params(first: str, last: str, password: str) -> dict:
+        """Returns the XML-RPC parameters for `login_to_simulator`."""
+        return {
             "first": first,
             "last": last,
             "passwd": "$1$" + md5(password.encode()).hexdigest(),
@@ -233,19 +471,17 @@ class client:
             "agree_to_tos": "true",
             "options": [],
         }
-        self.login_response = self._login_proxy.login_to_simulator(params)
-        self.udp_host = self.login_response["sim_ip"]
-        self.udp_port = self.login_response["sim_port"]
-        self.udp = socket(AF_INET, SOCK_DGRAM)
-        self.udp.connect((self.udp_host, self.udp_port))
+
+    def open_circuit(self, login_response: dict):
+        """Stores the region address and session values from a login response."""
+        self.udp_host = login_response["sim_ip"]
+        self.udp_port = login_response["sim_port"]
         self.sequence = 1
 
         # Pre-hash some persistent values.
-        circuit_code = self.login_response["circuit_code"]
-        session_id = self.login_response["session_id"]
-        agent_id = self.login_response["agent_id"]
+        circuit_code = login_response["circuit_code"]
+        session_id = login_response["session_id"]
+        agent_id = login_response["agent_id"]
         self.circuit_code_bytes = struct.pack("i", circuit_code)
         self.session_id_bytes = UUID(session_id).bytes
         self.agent_id_bytes = UUID(agent_id).bytes
-
-        return self.login_response
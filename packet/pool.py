@@ -0,0 +1,96 @@
+import asyncio
+import http.client
+import random
+import xmlrpc.client
+from typing import Iterable
+
+from .packet import client
+from .response import LOGIN_KEYS, Consumer, transport
+
+# Logins of many agents share a few XML-RPC connections.
+# Each `ServerProxy` keeps its HTTP connection open between calls, but is not
+# thread-safe, so a proxy is lent to one call at a time from an idle queue.
+
+
+class LoginError(Exception):
+    """The login server refused the login, retrying will not help."""
+
+    def __init__(self, response: dict):
+        super().__init__(f"{response.get('reason')}: {response.get('message')}")
+        self.response = response
+
+
+def is_transient(error: Exception) -> bool:
+    """Network errors, server errors and rate limiting are worth retrying."""
+    if isinstance(error, xmlrpc.client.ProtocolError):
+        return error.errcode >= 500 or error.errcode == 429
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+class login_pool:
+    """
+    Signs agents in concurrently, at most `connections` at a time.
+    Transient failures are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        uri: str = client._login_uri,
+        connections: int = 4,
+        retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 30.0,
+        keys: Iterable[str] = LOGIN_KEYS,
+    ):
+        self.uri = uri
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._transports = [transport(uri, timeout, keys) for _ in range(connections)]
+        self._proxies = [
+            xmlrpc.client.ServerProxy(uri, transport=x) for x in self._transports
+        ]
+        self._idle = asyncio.Queue()
+        for pair in zip(self._proxies, self._transports):
+            self._idle.put_nowait(pair)
+
+    async def login(
+        self, params: dict, consumers: dict[str, Consumer] | None = None
+    ) -> dict:
+        """
+        Calls `login_to_simulator` in a worker thread and returns the declared keys
+        of the response. `consumers` receive the items of large sections such as
+        "inventory-skeleton" as they are parsed, on that worker thread.
+        Raises `LoginError` if refused, or the last error once out of retries.
+        """
+        for attempt in range(self.retries + 1):
+            proxy, transport = pair = await self._idle.get()
+            transport.consumers = consumers
+            call = asyncio.ensure_future(
+                asyncio.to_thread(proxy.login_to_simulator, params)
+            )
+            # Lent again once the worker thread is done with it, even if cancelled.
+            call.add_done_callback(lambda call, pair=pair: self._release(pair, call))
+            try:
+                response = await asyncio.shield(call)
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+            else:
+                if response.get("login") == "false":
+                    raise LoginError(response)
+                return response
+            cap = min(self.max_backoff, self.backoff * 2**attempt)
+            await asyncio.sleep(random.uniform(0, cap))
+
+    def _release(self, pair: tuple, call: asyncio.Future):
+        if not call.cancelled():
+            call.exception()  # Retrieved here, its caller may have been cancelled.
+        pair[1].consumers = None
+        self._idle.put_nowait(pair)
+
+    def close(self):
+        """Closes the pooled HTTP connections."""
+        for proxy in self._proxies:
+            proxy("close")()
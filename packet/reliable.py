@@ -0,0 +1,127 @@
+import struct
+import time
+from typing import Callable
+
+import packet
+
+# Reliable packets are kept until the region acknowledges their sequence number.
+# Timeouts follow RFC 6298: smoothed RTT plus four times its variance,
+# doubled on every retransmission and never sampled from resent packets (Karn).
+
+
+class unacked:
+    """A reliable packet waiting for its PacketAck."""
+
+    __slots__ = ("sequence", "data", "sent", "timeout", "retries", "callback")
+
+    def __init__(self, sequence: int, data: bytes, sent: float, timeout: float):
+        self.sequence = sequence
+        self.data = bytearray(data)
+        self.sent = sent
+        self.timeout = timeout
+        self.retries = 0
+        self.callback = None  # Called with True when delivered, False if given up.
+
+
+class reliability:
+    """
+    Tracks unacknowledged reliable packets and decides when to resend them.
+    Sending itself is left to `send`, so this works with any client.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], object],
+        max_retries: int = 3,
+        min_timeout: float = 0.25,
+        max_timeout: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.send = send
+        self.max_retries = max_retries
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.clock = clock
+        self.pending: dict[int, unacked] = {}
+        self.srtt = None  # Smoothed round-trip time.
+        self.rttvar = None
+        self.timeout = 1.0  # Until the first RTT sample.
+
+    def track(
+        self, data: bytes, callback: Callable[[bool], object] | None = None
+    ) -> unacked:
+        """Remembers a reliable packet that was just sent."""
+        sequence = int.from_bytes(data[1:5])
+        entry = unacked(sequence, data, self.clock(), self.timeout)
+        entry.callback = callback
+        self.pending[sequence] = entry
+        return entry
+
+    def acknowledge(self, sequence: int) -> bool:
+        """Marks a packet as delivered. Returns False for unknown or repeated ACKs."""
+        entry = self.pending.pop(sequence, None)
+        if entry is None:
+            return False
+        if not entry.retries:
+            self.sample(self.clock() - entry.sent)
+        if entry.callback is not None:
+            entry.callback(True)
+        return True
+
+    def sample(self, rtt: float):
+        """Updates the retransmission timeout from a measured round-trip time."""
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        timeout = self.srtt + 4 * self.rttvar
+        self.timeout = min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def resend_expired(self) -> int:
+        """
+        Resends packets whose timeout elapsed, flagged as `RESENT`.
+        Packets out of retries are dropped and reported as failed.
+        Returns the number of packets resent.
+        """
+        now = self.clock()
+        resent = 0
+        for sequence, entry in list(self.pending.items()):
+            if now - entry.sent < entry.timeout:
+                continue
+            if entry.retries >= self.max_retries:
+                del self.pending[sequence]
+                if entry.callback is not None:
+                    entry.callback(False)
+                continue
+            entry.retries += 1
+            entry.sent = now
+            entry.timeout = min(entry.timeout * 2, self.max_timeout)
+            entry.data[0] |= packet.RESENT
+            self.send(entry.data)
+            resent += 1
+        return resent
+
+    def next_deadline(self) -> float | None:
+        """Returns the clock time of the earliest timeout, if anything is pending."""
+        if not self.pending:
+            return None
+        return min(x.sent + x.timeout for x in self.pending.values())
+
+
+def is_packet_ack(data: bytes) -> bool:
+    """Expects bytes from the beginning of the packet."""
+    if len(data) <= packet.BODY_BYTE:
+        return False
+    offset = packet.BODY_BYTE + data[5]
+    return len(data) > offset + 4 and data[offset : offset + 4] == b"\xff\xff\xff\xfb"
+
+
+def parse_packet_ack(data: bytes) -> list[int]:
+    """
+    Expects bytes from the beginning of a PacketAck packet.
+    Returns the acknowledged sequence numbers.
+    """
+    offset = packet.BODY_BYTE + data[5] + packet.fixed.size
+    count = data[offset]
+    return list(struct.unpack_from(f"<{count}L", data, offset + 1))
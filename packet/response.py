@@ -0,0 +1,193 @@
+import base64
+import xmlrpc.client
+from typing import BinaryIO, Callable, Iterable
+from xml.parsers import expat
+
+# Login responses can carry inventory skeletons, buddy lists and other large sections.
+# Instead of unmarshalling the whole XML-RPC struct, the response is parsed as it
+# streams in: declared keys are kept, large sections are handed item by item to
+# consumers, and everything else is skipped without building any objects.
+
+LOGIN_KEYS = (
+    "login",
+    "reason",
+    "message",
+    "first_name",
+    "last_name",
+    "agent_id",
+    "session_id",
+    "secure_session_id",
+    "circuit_code",
+    "sim_ip",
+    "sim_port",
+    "region_x",
+    "region_y",
+    "seed_capability",
+)
+
+Consumer = Callable[[object], object]
+
+_scalars = {
+    "string": str,
+    "int": int,
+    "i4": int,
+    "i8": int,
+    "double": float,
+    "boolean": lambda x: x.strip() == "1",
+    "base64": base64.b64decode,
+    "dateTime.iso8601": str,
+    "nil": lambda x: None,
+}
+
+
+class _parser:
+    """Expat callbacks building only the values that are kept."""
+
+    def __init__(self, keys: Iterable[str], consumers: dict[str, Consumer]):
+        self.keys = set(keys)
+        self.consumers = consumers
+        self.stack: list[dict | list] = []  # Open structs and arrays.
+        self.names: list[str | None] = []  # Current member name of each level.
+        self.text: list[str] | None = None
+        self.value = None
+        self.typed = False  # The current <value> had a type element.
+        self.skip = 0  # Nesting while skipping an undeclared member, 0 if not.
+        self.stream = None  # Consumer of the array being streamed.
+        self.fault = False
+        self.result = None
+
+    def start(self, tag: str, attrs: dict):
+        if self.skip:
+            if tag in ("struct", "array"):
+                self.skip += 1
+            return
+        if tag == "struct":
+            self.stack.append({})
+            self.names.append(None)
+        elif tag == "array":
+            if len(self.stack) == 1 and self.names[0] in self.consumers:
+                self.stream = self.consumers[self.names[0]]
+            self.stack.append([])
+            self.names.append(None)
+        elif tag == "value":
+            self.typed = False
+            self.text = []
+        elif tag in _scalars or tag == "name":
+            self.text = []
+        elif tag == "fault":
+            self.fault = True
+
+    def end(self, tag: str):
+        if self.skip:
+            if tag in ("struct", "array"):
+                self.skip -= 1
+            elif tag == "member" and self.skip == 1:
+                self.skip = 0
+            return
+        if tag in _scalars:
+            self.value, self.typed = _scalars[tag]("".join(self.text)), True
+        elif tag == "name":
+            self.names[-1] = name = "".join(self.text)
+            top = len(self.stack) == 1 and not self.fault
+            if top and name not in self.keys and name not in self.consumers:
+                self.skip = 1  # Until this member ends.
+        elif tag in ("struct", "array"):
+            self.names.pop()
+            self.value, self.typed = self.stack.pop(), True
+        elif tag == "value":
+            if not self.typed:
+                self.value = "".join(self.text)  # Untyped values are strings.
+            self.deliver(self.value)
+        self.text = None
+
+    def deliver(self, value):
+        if not self.stack:
+            self.result = value
+            return
+        parent = self.stack[-1]
+        if isinstance(parent, list):
+            if self.stream is not None and len(self.stack) == 2:
+                self.stream(value)  # Not kept in the list.
+            else:
+                parent.append(value)
+            return
+        name = self.names[-1]
+        if len(self.stack) == 1 and name in self.consumers:
+            if self.stream is None:
+                self.consumers[name](value)  # Not an array, handed over whole.
+            self.stream = None
+        else:
+            parent[name] = value
+
+    def data(self, text: str):
+        if self.text is not None and not self.skip:
+            self.text.append(text)
+
+
+def parse_login(
+    stream: BinaryIO,
+    keys: Iterable[str] = LOGIN_KEYS,
+    consumers: dict[str, Consumer] | None = None,
+    chunk: int = 16 * 1024,
+) -> dict:
+    """
+    Reads an XML-RPC login response from a file-like object.
+    Returns a dict of the top-level `keys` present in the response.
+    `consumers` are called with each item of their (array) section as it is parsed.
+    Raises `xmlrpc.client.Fault` for fault responses.
+    """
+    state = _parser(keys, consumers or {})
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = state.start
+    parser.EndElementHandler = state.end
+    parser.CharacterDataHandler = state.data
+    while data := stream.read(chunk):
+        parser.Parse(data, False)
+    parser.Parse(b"", True)
+    if state.fault:
+        raise xmlrpc.client.Fault(**state.result)
+    return state.result
+
+
+class _Login:
+    """
+    Transport with a connection timeout, so a hung server is retried,
+    and a streaming response parser that keeps only the declared keys.
+    """
+
+    def __init__(self, timeout: float, keys: Iterable[str]):
+        super().__init__()
+        self.timeout = timeout
+        self.keys = keys
+        self.consumers = None  # Set for one call at a time.
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+    def parse_response(self, response) -> tuple:
+        stream = response
+        if response.getheader("Content-Encoding", "") == "gzip":
+            stream = xmlrpc.client.GzipDecodedResponse(response)
+        try:
+            return (parse_login(stream, self.keys, self.consumers),)
+        finally:
+            if stream is not response:
+                stream.close()
+
+
+class _Transport(_Login, xmlrpc.client.Transport):
+    pass
+
+
+class _SafeTransport(_Login, xmlrpc.client.SafeTransport):
+    pass
+
+
+def transport(uri: str, timeout: float = 30.0, keys: Iterable[str] = LOGIN_KEYS):
+    """Returns a transport for `uri` that parses responses with `parse_login()`."""
+    if uri.startswith("https:"):
+        return _SafeTransport(timeout, keys)
+    return _Transport(timeout, keys)
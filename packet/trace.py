@@ -0,0 +1,95 @@
+import logging
+import parser.template as template
+import parser.zerocode as zerocode
+import queue
+import threading
+import time
+
+import packet
+
+# Packets are traced by queueing the raw bytes with a timestamp.
+# Formatting and writing the log happen on a background thread,
+# so the receive loop never waits on string building or disk I/O.
+
+
+class tracer:
+    """
+    Logs packets off the event loop, like a `QueueHandler` that defers formatting too.
+    `rates` samples chatty messages by name: 0 never logs, 0.1 logs every tenth, 1 logs all.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        rates: dict[str, float] | None = None,
+        level: int = logging.DEBUG,
+        table: dict | None = None,
+    ):
+        self.logger = logger
+        self.level = level
+        self.rates = dict(rates or {})
+        # Bidirectional names and numbers, `template.message` by default.
+        self._table = table
+        self._rates = None  # Rates by message number, resolved on first trace.
+        self._credit: dict[int, float] = {}  # Accumulated rate per message number.
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    @property
+    def table(self) -> dict:
+        if self._table is None:
+            self._table = template.message
+        return self._table
+
+    def trace(self, data: bytes, number: int | None = None, direction: str = "in"):
+        """Queues a packet for logging, if the level is enabled and it is sampled."""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if number is None:
+            number = packet.message_number(data)
+        if self._rates is None:
+            self._rates = {self.table[k]: v for k, v in self.rates.items()}
+        rate = self._rates.get(number, 1.0)
+        if rate < 1.0:
+            credit = self._credit.get(number, 0.0) + rate
+            if credit < 1.0:
+                self._credit[number] = credit
+                return
+            self._credit[number] = credit - 1.0
+        if self._thread is None:
+            self.start()
+        self._queue.put((time.time(), direction, bytes(data)))
+
+    def start(self):
+        """Starts the writer thread, done by the first `trace()`."""
+        self._thread = threading.Thread(
+            name="packet_trace_thread", target=self._write, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Writes everything queued so far and ends the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _write(self):
+        while (item := self._queue.get()) is not None:
+            created, direction, data = item
+            try:
+                message = self.format(direction, data)
+            except Exception as e:
+                hexa = zerocode.byte2hex(data)
+                message = f"{direction} malformed packet ({e}): {hexa}"
+            record = self.logger.makeRecord(
+                self.logger.name, self.level, __file__, 0, message, None, None
+            )
+            record.created = created
+            record.msecs = created % 1 * 1000
+            self.logger.handle(record)
+
+    def format(self, direction: str, data: bytes) -> str:
+        header = packet.parse_header(data)
+        name = self.table.get(header.number, "Unknown")
+        return f"{direction} {header}\t{name}\n\tUDP: {zerocode.byte2hex(data)}"
@@ -1,7 +1,260 @@
+import collections
+import concurrent.futures
+import os
 import parser.template
 import parser.zerocode
+import struct
+from typing import BinaryIO, Iterator, NamedTuple
 
 import packet
+from message.export import exporter
+from message.generic import Decoder
+from packet.acks import split_acks
+
+# Captures are read one record at a time, so memory use does not grow with file size.
+# Supported: pcap (any byte order, micro- or nanosecond timestamps) and pcapng,
+# carrying Ethernet (with VLAN tags), Linux cooked (SLL/SLL2), raw IP or loopback frames.
+
+PCAPNG = 0x0A0D0D0A
+
+# Link-layer header types.
+NULL = 0
+ETHERNET = 1
+RAW = 101
+SLL = 113
+SLL2 = 276
+IPV4 = 228
+IPV6 = 229
+
+
+class Datagram(NamedTuple):
+    time: float
+    source: tuple[str, int]
+    destination: tuple[str, int]
+    payload: bytes
+
+
+def frames(file: BinaryIO) -> Iterator[tuple[float, int, bytes]]:
+    """Yields the timestamp, link type and bytes of each captured frame."""
+    magic = file.read(4)
+    if len(magic) < 4:
+        return
+    if int.from_bytes(magic, "little") == PCAPNG:
+        yield from _pcapng(file, magic)
+    else:
+        yield from _pcap(file, magic)
+
+
+def _pcap(file: BinaryIO, magic: bytes) -> Iterator[tuple[float, int, bytes]]:
+    for order in "<>":
+        [number] = struct.unpack(order + "L", magic)
+        if number in (0xA1B2C3D4, 0xA1B23C4D):
+            break
+    else:
+        raise ValueError(f"Not a pcap or pcapng file ({magic.hex()})")
+    scale = 1e-6 if number == 0xA1B2C3D4 else 1e-9
+    *_, link = struct.unpack(order + "HHlLLL", file.read(20))
+    link &= 0xFFFF  # Upper bits carry FCS flags.
+    record = struct.Struct(order + "LLLL")
+    while len(head := file.read(record.size)) == record.size:
+        seconds, fraction, size, _ = record.unpack(head)
+        yield seconds + fraction * scale, link, file.read(size)
+
+
+def _pcapng(file: BinaryIO, magic: bytes) -> Iterator[tuple[float, int, bytes]]:
+    order = "<"
+    interfaces = []  # Link type and timestamp scale, by interface ID.
+    head = magic + file.read(4)
+    while len(head) == 8:
+        if head[:4] == magic:  # Section Header, the same in either byte order.
+            order = "<" if file.read(4) == b"\x4d\x3c\x2b\x1a" else ">"
+            [length] = struct.unpack(order + "L", head[4:])
+            file.read(length - 12)
+            interfaces = []
+            head = file.read(8)
+            continue
+        kind, length = struct.unpack(order + "LL", head)
+        body = file.read(length - 8)
+        if kind == 1:  # Interface Description
+            [link] = struct.unpack_from(order + "H", body)
+            interfaces.append((link, _tsresol(body[8:-4], order)))
+        elif kind == 6:  # Enhanced Packet
+            interface, high, low, size, _ = struct.unpack_from(order + "5L", body)
+            link, scale = interfaces[interface]
+            yield ((high << 32) | low) * scale, link, body[20 : 20 + size]
+        elif kind == 3:  # Simple Packet, without timestamp.
+            [size] = struct.unpack_from(order + "L", body)
+            link, scale = interfaces[0]
+            yield 0.0, link, body[4 : 4 + min(size, len(body) - 8)]
+        head = file.read(8)
+
+
+def _tsresol(options: bytes, order: str) -> float:
+    """Reads the timestamp resolution option of an interface description."""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, size = struct.unpack_from(order + "HH", options, offset)
+        if code == 0:
+            break
+        if code == 9:
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0**-value
+        offset += 4 + (size + 3) // 4 * 4
+    return 1e-6
+
+
+def _network(link: int, frame: bytes) -> tuple[int, int]:
+    """Returns the EtherType and offset of the network layer, or (0, 0)."""
+    if link == ETHERNET:
+        kind, offset = int.from_bytes(frame[12:14]), 14
+        while kind in (0x8100, 0x88A8):  # VLAN tags.
+            kind, offset = int.from_bytes(frame[offset + 2 : offset + 4]), offset + 4
+        return kind, offset
+    if link == SLL:
+        return int.from_bytes(frame[14:16]), 16
+    if link == SLL2:
+        return int.from_bytes(frame[0:2]), 20
+    if link in (RAW, IPV4, IPV6) and frame:
+        return (0x0800 if frame[0] >> 4 == 4 else 0x86DD), 0
+    if link == NULL:  # Address family, IPv6 differs per OS.
+        family = int.from_bytes(frame[:4], "little")
+        return _families.get(family, 0), 4
+    return 0, 0
+
+
+_families = {2: 0x0800, 10: 0x86DD, 24: 0x86DD, 28: 0x86DD, 30: 0x86DD}
+
+
+def _udp(link: int, frame: bytes) -> tuple[str, str, int] | None:
+    """Returns the source and destination address and UDP offset, if it carries UDP."""
+    kind, offset = _network(link, frame)
+    if kind == 0x0800:
+        if len(frame) < offset + 20 or frame[offset + 9] != 17:
+            return None
+        if int.from_bytes(frame[offset + 6 : offset + 8]) & 0x1FFF:
+            return None  # Not the first fragment.
+        source = ".".join(map(str, frame[offset + 12 : offset + 16]))
+        destination = ".".join(map(str, frame[offset + 16 : offset + 20]))
+        return source, destination, offset + (frame[offset] & 0x0F) * 4
+    if kind == 0x86DD:
+        if len(frame) < offset + 40:
+            return None
+        source = _ipv6(frame[offset + 8 : offset + 24])
+        destination = _ipv6(frame[offset + 24 : offset + 40])
+        header, offset = frame[offset + 6], offset + 40
+        while header in (0, 43, 60) and offset + 8 <= len(frame):  # Extension headers.
+            header, offset = frame[offset], offset + (frame[offset + 1] + 1) * 8
+        return (source, destination, offset) if header == 17 else None
+    return None
+
+
+def _ipv6(address: bytes) -> str:
+    return ":".join(address[i : i + 2].hex() for i in range(0, 16, 2))
+
+
+def datagrams(path: str, ports: set[int] | None = None) -> Iterator[Datagram]:
+    """
+    Yields the UDP datagrams of a pcap or pcapng file.
+    With `ports`, only datagrams from or to those ports.
+    """
+    with open(path, "rb") as file:
+        for time, link, frame in frames(file):
+            if (found := _udp(link, frame)) is None:
+                continue
+            source, destination, offset = found
+            if len(frame) < offset + 8:
+                continue
+            sport, dport, size = struct.unpack_from(">HHH", frame, offset)
+            if ports is not None and sport not in ports and dport not in ports:
+                continue
+            payload = frame[offset + 8 : offset + size]
+            yield Datagram(time, (source, sport), (destination, dport), payload)
+
+
+def packets(
+    path: str,
+    messages: set[str] | None = None,
+    ports: set[int] | None = None,
+    table: dict | None = None,
+) -> Iterator[tuple[Datagram, packet.packet_header]]:
+    """
+    Yields Second Life packets and their parsed headers.
+    With `messages`, only packets of those message names.
+    UDP datagrams without a valid header are skipped.
+    """
+    numbers = None
+    if messages is not None:
+        table = parser.template.message if table is None else table
+        numbers = {table[x] for x in messages}
+    for datagram in datagrams(path, ports):
+        try:
+            header = packet.parse_header(datagram.payload)
+        except (ValueError, IndexError, struct.error):
+            continue
+        if numbers is None or header.number in numbers:
+            yield datagram, header
+
+
+_decoder = None
+
+
+def _start(schema: dict | None):
+    global _decoder
+    _decoder = Decoder(parser.template.schema if schema is None else schema)
+
+
+def _decode(batch: list[tuple[float, bytes]]) -> list[tuple[float, str, dict | None]]:
+    out = []
+    for time, data in batch:
+        try:
+            name, blocks = _decoder.decode(split_acks(data)[0])
+        except Exception:
+            name, blocks = "", None  # Unknown or malformed message.
+        out.append((time, name, blocks))
+    return out
+
+
+def decode(
+    path: str,
+    messages: set[str] | None = None,
+    ports: set[int] | None = None,
+    schema: dict | None = None,
+    processes: int | None = None,
+    batch: int = 1000,
+) -> Iterator[tuple[float, str, dict | None]]:
+    """
+    Yields the timestamp, message name and decoded blocks of each packet, in capture order.
+    With `processes`, batches are decoded in a process pool; at most two per process
+    are in flight, so memory stays bounded for captures of any size.
+    """
+    table = None if schema is None else parser.template.table(schema)
+    batches = _batches(packets(path, messages, ports, table), batch)
+    if not processes:
+        _start(schema)
+        for items in batches:
+            yield from _decode(items)
+        return
+    with concurrent.futures.ProcessPoolExecutor(
+        processes, initializer=_start, initargs=(schema,)
+    ) as pool:
+        pending = collections.deque()
+        for items in batches:
+            pending.append(pool.submit(_decode, items))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _batches(found: Iterator, size: int) -> Iterator[list[tuple[float, bytes]]]:
+    items = []
+    for datagram, _ in found:
+        items.append((datagram.time, datagram.payload))
+        if len(items) == size:
+            yield items
+            items = []
+    if items:
+        yield items
 
 
 def parse():
@@ -20,9 +273,9 @@ def parse():
             print()
             data = data.rstrip()[UDP_HEADER:]
             data_bytes = parser.zerocode.hex2byte(data)
-            message_num = packet.message_number(data_bytes)
-            message_name = parser.template.message[message_num]
-            print(packet.human_header(data_bytes), message_name)
+            header = packet.parse_header(data_bytes)
+            message_name = parser.template.message[header.number]
+            print(header, message_name)
             print(data)
             print()
 
@@ -36,4 +289,43 @@ def parse():
 
 
 if __name__ == "__main__":
-    parse()
+    import argparse
+
+    args = argparse.ArgumentParser(
+        description="Prints Second Life packets of a capture."
+    )
+    args.add_argument(
+        "path", nargs="?", help="pcap or pcapng file, dissect.txt if omitted"
+    )
+    args.add_argument("-m", "--message", action="append", help="only these messages")
+    args.add_argument(
+        "-p", "--port", action="append", type=int, help="only these ports"
+    )
+    args.add_argument("--decode", action="store_true", help="decode message blocks")
+    args.add_argument("--export", metavar="DIR", help="write decoded columns to DIR")
+    args.add_argument("--processes", type=int, default=os.cpu_count())
+    args = args.parse_args()
+
+    messages = set(args.message) if args.message else None
+    ports = set(args.port) if args.port else None
+    if args.path is None:
+        parse()
+    elif args.export:
+        found = decode(args.path, messages, ports, processes=args.processes)
+        with exporter(args.export, parser.template.schema) as export:
+            for time, name, blocks in found:
+                if blocks is not None:
+                    export.add(time, name, blocks)
+        print(f"Exported {args.path} to {args.export} ({export.format})")
+    elif args.decode:
+        for time, name, blocks in decode(
+            args.path, messages, ports, processes=args.processes
+        ):
+            print(f"{time:.6f} {name} {blocks}")
+    else:
+        for datagram, header in packets(args.path, messages, ports):
+            name = parser.template.message.get(header.number, "Unknown")
+            print(f"{datagram.time:.6f} {datagram.source} -> {datagram.destination}")
+            print(header, name)
+            print(parser.zerocode.byte2hex(datagram.payload))
+            print()
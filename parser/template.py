@@ -1,41 +1,221 @@
-def parse():
+import marshal
+import os
+from hashlib import sha256
+from typing import NamedTuple
+
+
+class Field(NamedTuple):
+    name: str
+    type: str  # "U32", "LLUUID", "Variable", "Fixed", ...
+    size: int = 0  # Byte count for "Fixed", prefix size for "Variable".
+
+
+class Block(NamedTuple):
+    name: str
+    kind: str  # "Single", "Multiple" or "Variable"
+    count: int  # Repetitions for "Multiple", otherwise 1.
+    fields: tuple[Field, ...]
+
+
+class Template(NamedTuple):
+    name: str
+    frequency: str  # "Fixed", "Low", "Medium" or "High"
+    id: int  # Number within its frequency.
+    number: int  # Encoded message number, as used by `packet.header()`.
+    trusted: bool
+    zerocoded: bool
+    flags: tuple[str, ...]  # Trailing flags such as "UDPDeprecated".
+    blocks: tuple[Block, ...]
+
+
+conversion = {
+    "Low": lambda x: 0xFFFF0000 | x,
+    "Medium": lambda x: (0xFF00 | x) << 16,
+    "High": lambda x: x << 24,
+    "Fixed": lambda x: x,
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits template text into words and braces, dropping `//` comments."""
+    out = []
+    for line in text.splitlines():
+        line = line.split("//", 1)[0]
+        out.extend(line.replace("{", " { ").replace("}", " } ").split())
+    return out
+
+
+def parse_schema(text: str) -> dict[str, Template]:
     """
-    Parses `message_template.msg` and returns a bidirectional dictionary for message names and their encoded number and frequency.
+    Parses the contents of `message_template.msg` into `Template` objects keyed by message name.
     """
     out = {}
+    words = tokenize(text)
+    i, n = 0, len(words)
+
+    def group(i: int) -> tuple[list, int]:
+        """Returns words and nested groups until the matching `}`."""
+        items = []
+        while words[i] != "}":
+            if words[i] == "{":
+                item, i = group(i + 1)
+                items.append(item)
+            else:
+                items.append(words[i])
+                i += 1
+        return items, i + 1
 
-    conversion = {
-        "Low": lambda x: 0xFFFF0000 | x,
-        "Medium": lambda x: (0xFF00 | x) << 16,
-        "High": lambda x: x << 24,
-        "Fixed": lambda x: x,
-    }
+    while i < n:
+        if words[i] != "{":
+            i += 1  # "version 2.0"
+            continue
+        items, i = group(i + 1)
+        head = [x for x in items if isinstance(x, str)]
+        name, frequency, number = head[0], head[1], head[2]
+        if frequency not in conversion:
+            continue
+        id = int(number, 16) if frequency == "Fixed" else int(number)
+        blocks = []
+        for block in (x for x in items if isinstance(x, list)):
+            kind = block[1]
+            count = int(block[2]) if kind == "Multiple" else 1
+            fields = tuple(
+                Field(x[0], x[1], int(x[2]) if len(x) > 2 else 0)
+                for x in block
+                if isinstance(x, list)
+            )
+            blocks.append(Block(block[0], kind, count, fields))
+        out[name] = Template(
+            name,
+            frequency,
+            id,
+            conversion[frequency](id),
+            head[3] == "Trusted",
+            head[4] == "Zerocoded",
+            tuple(head[5:]),
+            tuple(blocks),
+        )
+    return out
 
-    with open("message_template.msg", "r") as file:
-        for line in map(str.strip, file):
-            if line.startswith("//") or line.startswith("{") or not line:
-                continue
 
-            word = line.split()
+def table(schema: dict[str, Template]) -> dict:
+    """Returns a bidirectional dictionary for message names and their encoded number."""
+    out = {}
+    for name, template in schema.items():
+        out[template.number] = name
+        out[name] = template.number
+    return out
 
-            if len(word) < 3:
-                continue
 
-            name, type, freq = word[0], word[1], word[2]
-            if type not in conversion.keys():
-                continue
+def locate(name: str = "message_template.msg") -> str:
+    """
+    Finds the message template regardless of the current working directory.
+    Checks `$SL_MESSAGE_TEMPLATE`, the working directory, the project root and this package.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    candidates = [
+        os.environ.get("SL_MESSAGE_TEMPLATE", ""),
+        name,
+        os.path.join(os.path.dirname(here), name),
+        os.path.join(here, name),
+    ]
+    for path in filter(None, candidates):
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    raise FileNotFoundError(
+        f"{name} not found in {', '.join(filter(None, candidates))}"
+    )
 
-            number = int(freq if type != "Fixed" else int(freq, 16))
-            number = conversion[type](number)
 
-            out[number] = name
-            out[name] = number
+# The compiled schema is cached as nested tuples with `marshal`,
+# which loads much faster than tokenizing the template text again.
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__")
+
+
+def _cache_path(path: str, cache_dir: str) -> str:
+    key = sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"message_template.{key}.marshal")
+
+
+def _dump(schema: dict[str, Template]) -> tuple:
+    return tuple(
+        (*x[:7], tuple((*b[:3], tuple(map(tuple, b.fields))) for b in x.blocks))
+        for x in schema.values()
+    )
+
+
+def _restore(data: tuple) -> dict[str, Template]:
+    out = {}
+    for x in data:
+        blocks = tuple(Block(*b[:3], tuple(Field(*f) for f in b[3])) for b in x[7])
+        out[x[0]] = Template(*x[:7], blocks)
     return out
 
 
-message = parse()
+def load(
+    path: str | None = None, cache_dir: str | None = CACHE_DIR
+) -> dict[str, Template]:
+    """
+    Returns the parsed template schema, using a compiled cache when it is still valid.
+    The cache is keyed on the template's mtime and size, falling back to its content hash.
+    """
+    path = locate() if path is None else path
+    if cache_dir is None:
+        with open(path, "r") as file:
+            return parse_schema(file.read())
+
+    stat = os.stat(path)
+    cache = _cache_path(path, cache_dir)
+    cached = None
+    try:
+        with open(cache, "rb") as file:
+            cached = marshal.loads(file.read())
+        version, mtime, size, digest, data = cached
+        if version == CACHE_VERSION and (mtime, size) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            return _restore(data)
+    except (OSError, EOFError, ValueError, TypeError):
+        cached = None
+
+    with open(path, "rb") as file:
+        raw = file.read()
+    digest = sha256(raw).hexdigest()
+    if cached is not None and cached[0] == CACHE_VERSION and cached[3] == digest:
+        schema = _restore(cached[4])  # Touched but unchanged.
+    else:
+        schema = parse_schema(raw.decode())
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        entry = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest, _dump(schema))
+        with open(temp := f"{cache}.{os.getpid()}", "wb") as file:
+            file.write(marshal.dumps(entry))
+        os.replace(temp, cache)
+    except OSError:
+        pass  # Read-only installs still work, just without the cache.
+    return schema
+
+
+def parse():
+    """
+    Parses `message_template.msg` and returns a bidirectional dictionary for message names and their encoded number and frequency.
+    """
+    return table(load())
+
+
+def __getattr__(name: str):
+    """Loads `message` and `schema` on first use."""
+    if name not in ("message", "schema"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()["schema"] = load()
+    globals()["message"] = table(schema)
+    return globals()[name]
+
 
 if __name__ == "__main__":
+    message = parse()
     to_hex = lambda x: hex(x)[2:]
     print("Fixed", k := "PacketAck", to_hex(message[k]))
     print("High", k := "AgentUpdate", to_hex(message[k]))
@@ -1,28 +1,53 @@
+import re
+from typing import Iterable
+
+# One match per run of zeroes. The literal first zero lets `re` skip ahead with memchr.
+_runs = re.compile(b"(\x00\x00*)")
+
+
 def encode(input: bytes) -> bytes:
     """
     Zero-bytes are run-length encoded so that up to 255 zeroes become `\\x00\\xff`
     """
-    out = bytearray()
-    i, n = 0, len(input)
-    while i < n:  # While-loop for index skipping.
-        if zeroes := (input[i] == 0x00):
-            while (i + zeroes < n) and input[i + zeroes] == 0x00:
-                zeroes += 1
-            out.extend([0x00, zeroes])
-            i += zeroes
-        else:
-            out.append(input[i])
-            i += 1
-    return bytes(out)
+    return bytes(encode_into(bytearray(), (input,)))
 
 
 def encode_all(*args: bytes) -> bytes:
     """
-    Calls `packet.encode()` on each argument containing `bytes`.
+    Encodes all arguments as one continuous buffer, without concatenating them first.
+    """
+    return bytes(encode_into(bytearray(), args))
+
+
+def encode_into(out: bytearray, buffers: Iterable[bytes]) -> bytearray:
+    """
+    Appends the zerocoded contents of `buffers` to `out`, such as a send buffer.
+    Runs of zeroes continue across buffer boundaries.
     """
-    b = bytearray()
-    b.join(arg for arg in args if isinstance(arg, bytes))
-    return encode(b)
+    zeroes = 0  # Pending run, carried into the next buffer.
+    for buffer in buffers:
+        # `[data, run, data, ..., run, data]`, where data may be empty.
+        parts = _runs.split(buffer)
+        for i in range(0, len(parts), 2):
+            if part := parts[i]:
+                if zeroes:
+                    _run(out, zeroes)
+                    zeroes = 0
+                out += part
+            if i + 1 < len(parts):
+                zeroes += len(parts[i + 1])
+    if zeroes:
+        _run(out, zeroes)
+    return out
+
+
+def _run(out: bytearray, zeroes: int):
+    full = (zeroes - 1) // 0xFF  # The last chunk holds 1 to 255 zeroes.
+    out += b"\x00\xff" * full
+    out += bytes((0x00, zeroes - full * 0xFF))
+
+
+_zeroes = [bytes(count) for count in range(256)]
 
 
 def decode(input: bytes) -> bytes:
@@ -30,16 +55,37 @@ def decode(input: bytes) -> bytes:
     Converts bytes where zeroes are run-length encoded,
     such that `\\x00\\xff` is unpacked into 255 `\\x00` bytes.
     """
+    if not isinstance(input, (bytes, bytearray)):
+        input = bytes(input)  # memoryview has no split()
+    # Every part after a zero starts with the run length. (Assumes input was valid.)
+    parts = input.split(b"\x00")
+    out = [parts[0]]
+    for part in parts[1:]:
+        out.append(_zeroes[part[0]])
+        out.append(part[1:])
+    return b"".join(out)
+
+
+def decode_prefix(input: bytes, size: int, offset: int = 0) -> bytes:
+    """
+    Like `decode()` starting at `offset`, but stops once `size` bytes are produced.
+    Cost depends on `size` rather than the length of the input.
+    """
+    if not isinstance(input, (bytes, bytearray)):
+        # memoryview has no find(), `size` bytes take at most twice as many encoded.
+        input, offset = bytes(input[offset : offset + 2 * size]), 0
     out = bytearray()
-    i, n = 0, len(input)
-    while i < n:  # While-loop for index skipping.
-        if input[i] == 0x00:
-            out.extend(b"\0" * input[i + 1])
-            i += 2  # Assumes input was valid.
-        else:
-            out.append(input[i])
-            i += 1
-    return bytes(out)
+    find = input.find
+    i = offset
+    while len(out) < size:
+        zero = find(0, i, i + size - len(out))
+        if zero == -1:
+            out += input[i : i + size - len(out)]
+            break
+        out += input[i:zero]
+        out += _zeroes[input[zero + 1]]
+        i = zero + 2
+    return bytes(out[:size])
 
 
 def hex2byte(input: str) -> bytes:
@@ -53,4 +99,4 @@ def byte2hex(input: bytes) -> str:
     """
     Converts bytes into formatted string `'AA BB CC DD'`.
     """
-    return " ".join(f"{byte:02X}" for byte in input)
+    return bytes(input).hex(" ").upper()
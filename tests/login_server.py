@@ -0,0 +1,102 @@
+"""
+A local stand-in for the Second Life XML-RPC login server.
+Run it for bots under development: `python -m tests.login_server [port]`
+"""
+
+import threading
+import uuid
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+
+class _Handler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse connections.
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            fail = server.failures > 0
+            server.failures -= fail
+        if fail:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(HTTPStatus.SERVICE_UNAVAILABLE)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_POST()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class login_server(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Answers `login_to_simulator` with a region at `sim_ip`:`sim_port`.
+    `failures` requests are answered with 503 first, `delay` slows every login down.
+    Passwords other than `password` are refused, `extra` is added to every response.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, sim_ip: str = "127.0.0.1", sim_port: int = 13000):
+        super().__init__(
+            ("127.0.0.1", port), _Handler, logRequests=False, allow_none=True
+        )
+        self.sim_ip, self.sim_port = sim_ip, sim_port
+        self.failures = 0
+        self.delay = 0.0
+        self.extra = {}  # Further response members, e.g. inventory sections.
+        self.logins = []  # Parameters of each successful call.
+        self.connections = set()  # Client addresses seen, one per connection.
+        self.active = self.peak = 0  # Concurrent logins.
+        self.lock = threading.Lock()
+        self._done = threading.Event()
+        self.register_function(self.login_to_simulator)
+
+    @property
+    def uri(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def login_to_simulator(self, params: dict) -> dict:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            self._done.wait(self.delay)
+            if params["passwd"] != "$1$5f4dcc3b5aa765d61d8327deb882cf99":
+                return {"login": "false", "reason": "key", "message": "Wrong password"}
+            with self.lock:
+                self.logins.append(params)
+            return {
+                "login": "true",
+                "first_name": params["first"],
+                "last_name": params["last"],
+                "sim_ip": self.sim_ip,
+                "sim_port": self.sim_port,
+                "circuit_code": len(self.logins),
+                "session_id": str(uuid.uuid4()),
+                "agent_id": str(uuid.uuid4()),
+                **self.extra,
+            }
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def start(self) -> "login_server":
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    server = login_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+    print(f"Serving logins at {server.uri}")
+    server.serve_forever()
@@ -0,0 +1,99 @@
+import struct
+
+import packet
+from packet.acks import MTU, ack_queue, duplicate_window, split_acks
+from packet.reliable import parse_packet_ack
+
+
+def test_packet_ack():
+    acks = ack_queue()
+    assert acks.packet_ack(1) is None
+    for sequence in range(300):
+        acks.add(sequence)
+
+    first = acks.packet_ack(10)
+    assert int.from_bytes(first[1:5]) == 10
+    assert parse_packet_ack(first) == list(range(255))
+    assert parse_packet_ack(acks.packet_ack(11)) == list(range(255, 300))
+    assert not acks
+
+
+def test_append_to():
+    acks = ack_queue()
+    acks.add(1)
+    acks.add(0x01020304)
+
+    data = bytearray(packet.header(packet.UseCircuitCode, 5) + b"body")
+    assert acks.append_to(data) == 2
+    assert packet.is_acknowledge(data)
+    assert data.endswith(struct.pack(">2LB", 1, 0x01020304, 2))
+    assert not acks
+
+
+def test_append_to_mtu():
+    acks = ack_queue()
+    for sequence in range(10):
+        acks.add(sequence)
+    data = bytearray(MTU - 9)  # Room for the count and two ACKs.
+    assert acks.append_to(data) == 2
+    assert len(data) == MTU
+    assert len(acks) == 8
+
+
+def test_pack_into():
+    acks = ack_queue()
+    for sequence in range(10):
+        acks.add(sequence)
+    buffer = bytearray(2 * MTU)
+    assert acks.pack_into(buffer, MTU - 9) == MTU  # Two ACKs and the count.
+    assert buffer[0] & packet.ACKNOWLEDGE
+    assert buffer[MTU - 9 : MTU] == struct.pack(">2LB", 0, 1, 2)
+    assert acks.pack_into(buffer, MTU) == MTU and len(acks) == 8
+
+
+def test_split_acks():
+    body = packet.header(packet.UseCircuitCode, 7) + bytes(36)
+    assert split_acks(body) == (body, ())
+
+    data = bytearray(body)
+    acks = ack_queue()
+    for sequence in (1, 300, 70000):
+        acks.add(sequence)
+    acks.append_to(data)
+    stripped, sequences = split_acks(bytes(data))
+    assert sequences == (1, 300, 70000)
+    assert stripped[1:] == body[1:] and packet.is_acknowledge(stripped)
+
+
+def test_duplicate_window():
+    window = duplicate_window(size=8)
+    assert not window.seen(5)
+    assert window.seen(5)
+    assert not window.seen(3)  # Out of order, still new.
+    assert window.seen(3)
+    assert not window.seen(12)
+    assert window.seen(5)  # Oldest still in the window.
+    assert not window.seen(4)  # Older than the window, let through.
+    assert not window.seen(100)
+    assert not window.seen(12)  # Shifted out.
+
+
+def test_duplicate_window_wrap():
+    window = duplicate_window(size=8)
+    assert not window.seen(0xFFFFFE)
+    assert not window.seen(0xFFFFFF)
+    assert not window.seen(0)  # Wrapped, newer.
+    assert not window.seen(1)
+    assert window.seen(0)
+    assert window.seen(0xFFFFFF)
+    assert window.seen(2**32 - 1)  # The same, from a sender wrapping at 2**32.
+    assert not window.seen(0xFFFFF0)  # Older than the window, let through.
+    assert not window.seen(2)
+
+
+def test_duplicate_window_jump():
+    window = duplicate_window()
+    assert not window.seen(1)
+    assert not window.seen(1 + 2**23 - 1)  # Clamped to the window, not a huge shift.
+    assert window.bits == 1
+    assert window.seen(2**23)
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+import agent
+import packet
+from parser import template, zerocode
+from tests.test_circuit import LOGIN_RESPONSE, region
+
+NUMBERS = {
+    "UseCircuitCode": packet.low | 3,
+    "CompleteAgentMovement": packet.low | 249,
+    "RegionHandshake": packet.low | 148,
+    "ChatFromSimulator": packet.low | 139,
+    "KickUser": packet.low | 163,
+    "ImprovedInstantMessage": packet.low | 254,
+    "StartPingCheck": 1 << 24,
+    "CompletePingCheck": 2 << 24,
+    "AgentUpdate": 4 << 24,
+    "AgentThrottle": packet.low | 81,
+    "AgentFOV": packet.low | 82,
+    "AgentHeightWidth": packet.low | 83,
+}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = NUMBERS | {v: k for k, v in NUMBERS.items()}
+    monkeypatch.setitem(vars(template), "message", table)  # Without loading the file.
+    return table
+
+
+def expect(sim, name: str) -> tuple[bytes, tuple]:
+    """Reads datagrams until one of the named message arrives."""
+    while True:
+        data, address = sim.recvfrom(2048)
+        if packet.parse_header(data).number == NUMBERS[name]:
+            return data, address
+
+
+def test_runtime(table):
+    async def run():
+        bots = agent.runtime()
+        bots.keepalive_interval = 0.02
+        sims = []
+        for i in range(3):
+            bot = bots.add(agent.agent("bot", str(i), "password"))
+            sims.append(sim := region())
+
+            async def login(*args, circuit=bot.circuit, sim=sim):
+                circuit.open_circuit(
+                    LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]}
+                )
+                await circuit.connect()
+
+            bot.circuit.login = login
+
+        running = asyncio.create_task(bots.run())
+        for sim in sims:
+            _, address = await asyncio.to_thread(expect, sim, "UseCircuitCode")
+            await asyncio.to_thread(expect, sim, "CompleteAgentMovement")
+            await asyncio.to_thread(expect, sim, "AgentUpdate")  # Shared keepalive.
+
+            ping = packet.header(1 << 24, 5, 0, 2, b"\xaa\xbb")  # With extra header.
+            sim.sendto(ping + b"\x07\x00\x00\x00\x00", address)
+            pong, _ = await asyncio.to_thread(expect, sim, "CompletePingCheck")
+            assert pong[7] == 7
+
+            kick = packet.header(packet.low | 163, 6, packet.ZEROCODED)
+            kick += zerocode.encode(bytes(38) + b"\x04\x00bye\x00")
+            sim.sendto(kick, address)
+
+        await asyncio.wait_for(running, 1)
+        assert not bots.agents
+        for sim in sims:
+            sim.close()
+
+    asyncio.run(run())
+
+
+def test_close(table):
+    async def run():
+        bots = agent.runtime()
+        bot = bots.add(agent.agent("bot", "0", "password"))
+        signing_in = asyncio.Event()
+
+        async def login(*args):
+            signing_in.set()
+            await asyncio.sleep(10)
+
+        bot.circuit.login = login
+        running = asyncio.create_task(bots.run())
+        await signing_in.wait()
+        bots.close()
+        await asyncio.wait_for(running, 1)
+        assert not bots.agents
+
+    asyncio.run(run())
+
+
+def test_prebuilt(table):
+    bot = agent.agent("bot", "0", "password")
+    bot.circuit.open_circuit(LOGIN_RESPONSE | {"sim_port": 13000})
+    sent = []
+    bot.circuit.send = lambda data: sent.append(bytes(data))
+    bot.prebuild()
+    bot.SendAgentFOV()
+    bot.circuit.sequence = 2
+    bot.SendAgentFOV()
+    ids = bot.circuit.agent_id_bytes + bot.circuit.session_id_bytes
+    body = ids + bot.circuit.circuit_code_bytes
+    fov = packet.pack_sequence(packet.u32, 2, packet.f32, 6.233185307179586)
+    assert sent[1] == packet.header(packet.low | 82, 2) + body + fov
+    assert sent[0][1:5] == b"\x00\x00\x00\x01" and sent[0][-8:-4] == b"\x01\x00\x00\x00"
+
+
+class fake_circuit:
+    sequence = 1
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, *args):
+        self.sequence += 1
+        self.sent.append(b"".join(args))
+
+
+def test_update():
+    now = [0.0]
+    update = agent.agent_update(clock=lambda: now[0])
+    update.open(4 << 24, bytes(range(16)), bytes(range(16, 32)))
+    circuit = fake_circuit()
+
+    assert update.send(circuit)  # The first is due at once.
+    body = update.body()
+    assert update.body() is body  # Reused while nothing changes.
+    header = packet.parse_header(circuit.sent[0])
+    assert header.number == 4 << 24 and header.zerocoded
+    assert header.body[header.offset : header.offset + 32] == bytes(range(32))
+
+    update.set(control_flags=agent.AGENT_CONTROL_TURN_LEFT)
+    now[0] = 0.05
+    assert not update.send(circuit)  # Rate limited.
+    now[0] = 0.1
+    assert update.send(circuit) and update.body() is not body
+    fields = packet.parse_header(circuit.sent[1]).body[-5:]
+    assert fields == agent.AGENT_CONTROL_TURN_LEFT.to_bytes(4, "little") + b"\x00"
+
+    update.set(control_flags=agent.AGENT_CONTROL_TURN_LEFT)  # Unchanged.
+    now[0] = 0.5
+    assert not update.send(circuit)
+    now[0] = 1.1
+    assert update.send(circuit)  # Keepalive.
+    assert update.send(circuit, force=True)
+    assert len(circuit.sent) == 4
+
+    with pytest.raises(AttributeError):
+        update.set(speed=1)
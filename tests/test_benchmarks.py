@@ -0,0 +1,16 @@
+from benchmarks import suite
+
+
+def test_cases():
+    for name, (function, *args) in suite.cases().items():
+        function(*args)  # Every benchmark still runs.
+
+
+def test_compare():
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    lines, regressions = suite.compare(
+        {"a": 1.1, "b": 2.0, "c": 0.5, "d": 1}, baseline, 1.25
+    )
+    assert regressions == ["b"]
+    assert lines[2].endswith("REGRESSION") and lines[3].endswith("faster")
+    assert lines[4].endswith("new")
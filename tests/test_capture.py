@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+import packet
+from packet.capture import MAGIC, read, replay
+from tests.test_circuit import LOGIN_RESPONSE, region
+from tests.test_dispatch import PING, TABLE
+
+
+def test_read(tmp_path):
+    path = tmp_path / "test.slcap"
+    clock = iter((10.0, 10.5, 11.0)).__next__
+    with packet.recorder(path, clock) as capture:
+        capture.write(packet.INBOUND, b"first")
+        capture.write(packet.OUTBOUND, b"")
+    with packet.recorder(path, clock) as capture:  # Appends, magic only once.
+        capture.write(packet.INBOUND, b"third")
+
+    assert path.read_bytes().startswith(MAGIC)
+    assert list(read(path)) == [
+        (10.0, packet.INBOUND, b"first"),
+        (10.5, packet.OUTBOUND, b""),
+        (11.0, packet.INBOUND, b"third"),
+    ]
+
+    with open(path, "ab") as file:
+        file.write(b"\x00" * 5)  # Partial record, left by a crash.
+    assert len(list(read(path))) == 3
+
+    (bad := tmp_path / "bad.slcap").write_bytes(b"not a capture")
+    with pytest.raises(ValueError):
+        list(read(bad))
+
+
+def test_replay(tmp_path):
+    path = tmp_path / "test.slcap"
+    ping = packet.header(PING, 1) + b"\x05\x00\x00\x00\x00"
+    kick = packet.header(packet.low | 163, 2)
+    clock = iter((0.0, 0.0, 0.1, 0.2, 0.3)).__next__
+    with packet.recorder(path, clock) as capture:
+        capture.write(packet.INBOUND, ping)
+        capture.write(packet.OUTBOUND, packet.header(packet.UseCircuitCode, 1))
+        capture.write(packet.INBOUND, ping)
+        capture.write(packet.INBOUND, kick)
+        capture.write(packet.INBOUND, ping)  # After the kick, never handled.
+
+    handlers = packet.dispatcher(TABLE)
+    pings = []
+    handlers.on("StartPingCheck", pings.append)
+    handlers.on("KickUser", lambda header: False)
+    assert replay(path, handlers.dispatch) == 3
+    assert [header.data for header in pings] == [ping, ping]
+
+    start = time.monotonic()
+    assert replay(path, handlers.dispatch, realtime=True, speed=4) == 3
+    assert time.monotonic() - start >= 0.05  # 0.2 s recorded, four times faster.
+
+
+def test_replay_received(tmp_path):
+    path = tmp_path / "test.slcap"
+    ping = packet.header(PING, 1, packet.RELIABLE) + b"\x05\x00\x00\x00\x00"
+    acked = bytearray(ping)
+    acked[0] |= packet.ACKNOWLEDGE
+    acked += b"\x00\x00\x00\x09\x01"  # One appended ACK.
+    with packet.recorder(path) as capture:
+        capture.write(packet.INBOUND, bytes(acked))
+        capture.write(packet.INBOUND, bytes(acked))  # Resent, already handled.
+
+    handled = []
+    assert replay(path, handled.append) == 1
+    assert handled == [acked[: len(ping)]]  # Without the appended ACK.
+
+
+def test_circuit_capture(tmp_path):
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.capture = packet.recorder(tmp_path / "circuit.slcap")
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+
+        client.send(packet.header(packet.UseCircuitCode, 1))
+        _, address = await asyncio.to_thread(sim.recvfrom, 64)
+        sim.sendto(packet.header(PING, 7) + b"\x01\x00\x00\x00\x00", address)
+        await client.receive()
+
+        client.close()
+        client.capture.close()
+        sim.close()
+
+    asyncio.run(run())
+    records = list(read(tmp_path / "circuit.slcap"))
+    assert [x[1] for x in records] == [packet.OUTBOUND, packet.INBOUND]
+    assert records[1][2][1:5] == b"\x00\x00\x00\x07"
@@ -0,0 +1,208 @@
+import asyncio
+from socket import AF_INET, SOCK_DGRAM, socket
+
+import packet
+from packet.reliable import parse_packet_ack
+
+LOGIN_RESPONSE = {
+    "sim_ip": "127.0.0.1",
+    "circuit_code": 123456,
+    "session_id": "28c5efb6-fcaa-4ed5-9cf1-a640d1a99272",
+    "agent_id": "779e1d56-5500-4e22-940a-cd7b5adddbe0",
+}
+
+
+def region() -> socket:
+    """A local UDP socket standing in for the region."""
+    udp = socket(AF_INET, SOCK_DGRAM)
+    udp.bind(("127.0.0.1", 0))
+    udp.settimeout(1)
+    return udp
+
+
+def test_circuit():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+
+        client.send(b"\x00\x00\x00\x00\x01\x00", b"\xff")
+        data, address = await asyncio.to_thread(sim.recvfrom, 64)
+        assert data == b"\x00\x00\x00\x00\x01\x00\xff"
+        assert client.sequence == 2
+
+        sim.sendto(b"reply", address)
+        assert await client.receive() == b"reply"
+
+        client.close()
+        assert await client.receive() == b""
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_send_reliable():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+        client.reliable.timeout = 0.05
+
+        delivered = client.send_reliable(packet.header(packet.UseCircuitCode, 1))
+        first, address = await asyncio.to_thread(sim.recvfrom, 64)
+        assert first[0] & packet.RELIABLE and not first[0] & packet.RESENT
+
+        # Dropped by the region, so it is sent again.
+        resent, address = await asyncio.to_thread(sim.recvfrom, 64)
+        assert resent[0] & packet.RESENT and resent[1:] == first[1:]
+
+        ack = b"\x00\x00\x00\x00\x01\x00\xff\xff\xff\xfb\x01\x01\x00\x00\x00"
+        sim.sendto(ack, address)
+        assert await asyncio.wait_for(delivered, 1)
+        assert not client.reliable.pending
+
+        client.close()
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_acknowledge():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+        client.ack_delay = 0.01
+
+        # Piggybacked on the next outgoing packet.
+        client.acknowledge(40)
+        client.send(packet.header(packet.UseCircuitCode, client.sequence))
+        data, _ = await asyncio.to_thread(sim.recvfrom, 64)
+        assert packet.is_acknowledge(data) and data[-5:] == b"\x00\x00\x00\x28\x01"
+
+        # Coalesced into one PacketAck when nothing else is sent.
+        for sequence in (41, 42, 43):
+            client.acknowledge(sequence)
+        data, _ = await asyncio.to_thread(sim.recvfrom, 64)
+        assert parse_packet_ack(data) == [41, 42, 43]
+
+        client.close()
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_receive_duplicates():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+        client.ack_delay = 0.01
+
+        delivered = client.send_reliable(packet.header(packet.UseCircuitCode, 1))
+        _, address = await asyncio.to_thread(sim.recvfrom, 64)
+
+        # Reliable ping carrying an ACK for our packet, then resent by the region.
+        ping = b"\x50\x00\x00\x00\x09\x00\x01\x02\x00\x00\x00\x00"
+        sim.sendto(ping + b"\x00\x00\x00\x01\x01", address)
+        sim.sendto(b"\x60" + ping[1:], address)
+        sim.sendto(b"\x00\x00\x00\x00\x0a\x00\x01\x03\x00\x00\x00\x00", address)
+
+        assert await client.receive() == ping  # Without the appended ACK.
+        assert await asyncio.wait_for(delivered, 1)
+        assert (await client.receive())[4] == 0x0A  # The resent copy was dropped.
+
+        # Both copies acknowledged, in case the first ACK was lost.
+        data, _ = await asyncio.to_thread(sim.recvfrom, 64)
+        assert parse_packet_ack(data) == [9, 9]
+
+        client.close()
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_receive_burst():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.ring = packet.receive_ring(slots=4, size=64)
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+        client.send(packet.header(packet.UseCircuitCode, client.sequence))
+        _, address = await asyncio.to_thread(sim.recvfrom, 64)
+
+        # More than the ring holds arrive before any is handled.
+        for i in range(20):
+            sim.sendto(packet.header(4 << 24, i) + bytes([i]) * 8, address)
+        await asyncio.sleep(0.05)
+        received = [await client.receive() for _ in range(20)]
+        assert [bytes(x[-8:]) for x in received[-3:]] == [
+            bytes([i]) * 8 for i in range(17, 20)
+        ]
+        assert [x[-1] for x in received] == list(range(20))  # Later slots were copied.
+
+        client.close()
+        assert await client.receive() == b""
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_receive_held():
+    async def run():
+        sim = region()
+        client = packet.circuit()
+        client.ring = packet.receive_ring(slots=4, size=64)
+        client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+        await client.connect()
+        client.send(packet.header(packet.UseCircuitCode, client.sequence))
+        _, address = await asyncio.to_thread(sim.recvfrom, 64)
+
+        first = packet.header(4 << 24, 1, packet.RELIABLE) + b"A" * 8
+        sim.sendto(first, address)
+        sim.sendto(first, address)  # Resent, dropped but its slot was used.
+        sim.sendto(packet.header(4 << 24, 2, packet.RELIABLE) + b"B" * 8, address)
+        await asyncio.sleep(0.05)
+        held = await client.receive()
+        assert held == first
+
+        # The consumer awaits something else while more arrive.
+        for i in range(3, 5):
+            sim.sendto(packet.header(4 << 24, i) + bytes([i]) * 8, address)
+        await asyncio.sleep(0.05)
+        assert held == first
+        assert (await client.receive())[-8:] == b"B" * 8
+        assert [bytes((await client.receive())[-8:]) for _ in range(2)] == [
+            bytes([i]) * 8 for i in range(3, 5)
+        ]
+
+        client.close()
+        sim.close()
+
+    asyncio.run(run())
+
+
+def test_shared_buffer():
+    async def run():
+        sim = region()
+        clients = [packet.circuit(), packet.circuit()]
+        for client in clients:
+            client.open_circuit(LOGIN_RESPONSE | {"sim_port": sim.getsockname()[1]})
+            await client.connect()
+        assert clients[0].buffer is clients[1].buffer  # One per event loop.
+        for i, client in enumerate(clients):
+            client.send(
+                packet.header(packet.UseCircuitCode, client.sequence), bytes([i])
+            )
+        data = [(await asyncio.to_thread(sim.recvfrom, 64))[0] for _ in clients]
+        assert sorted(x[-1] for x in data) == [0, 1]
+        for client in clients:
+            client.close()
+        sim.close()
+
+    asyncio.run(run())
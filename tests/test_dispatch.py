@@ -0,0 +1,52 @@
+import pytest
+
+import packet
+
+PING = 1 << 24  # StartPingCheck, High 1
+TABLE = {
+    "StartPingCheck": PING,
+    PING: "StartPingCheck",
+    "KickUser": packet.low | 163,
+    packet.low | 163: "KickUser",
+    "UseCircuitCode": packet.UseCircuitCode,
+    packet.UseCircuitCode: "UseCircuitCode",
+}
+
+
+def test_dispatch():
+    handlers = packet.dispatcher(TABLE)
+    calls = []
+
+    @handlers.on("StartPingCheck")
+    def first(header):
+        calls.append(("first", header.data))
+
+    handlers.on("StartPingCheck", lambda header: calls.append(("second", header)))
+    handlers.on("KickUser", lambda header: False)
+    handlers.default = lambda header: calls.append(("default", header.data))
+
+    ping = packet.header(PING, 1) + b"\x05\x00\x00\x00\x00"
+    assert handlers.dispatch(ping)
+    header = calls[1][1]
+    assert calls == [("first", ping), ("second", header)]
+    assert header.body[header.offset :] == b"\x05\x00\x00\x00\x00"
+
+    calls.clear()
+    other = packet.header(packet.UseCircuitCode, 2)
+    assert handlers.dispatch(other)
+    assert calls == [("default", other)]
+
+    assert not handlers.dispatch(packet.header(packet.low | 163, 3))
+
+    calls.clear()
+    handlers.off("StartPingCheck", first)
+    header = packet.parse_header(ping)
+    handlers.dispatch(header)
+    assert calls == [("second", header)]  # Parsed once, by the caller.
+
+
+def test_unknown():
+    handlers = packet.dispatcher(TABLE)
+    handlers.on("NotAMessage", print)
+    with pytest.raises(KeyError, match="NotAMessage"):
+        handlers.resolve()
@@ -0,0 +1,127 @@
+import struct
+from parser import dissect, template, zerocode
+
+import packet
+from tests.test_template import TEMPLATE
+
+PING = zerocode.hex2byte("00 00 00 00 38 00 01 01 37 00 00 00")
+COARSE = zerocode.hex2byte(
+    "00 00 00 00 01 00 FF 06 02 80 80 14 81 7F 15 00 00 FF FF 00"
+)
+
+
+def udp(payload: bytes, sport: int = 13005, dport: int = 50000) -> bytes:
+    return struct.pack(">HHHH", sport, dport, 8 + len(payload), 0) + payload
+
+
+def ipv4(payload: bytes, protocol: int = 17) -> bytes:
+    return (
+        struct.pack(">BBHHHBBH", 0x45, 0, 20 + len(payload), 0, 0, 64, protocol, 0)
+        + bytes((10, 0, 0, 1, 192, 168, 1, 2))
+        + payload
+    )
+
+
+def ipv6(payload: bytes) -> bytes:
+    return (
+        struct.pack(">LHBB", 6 << 28, len(payload), 17, 64)
+        + bytes(15)
+        + b"\x01"
+        + bytes(15)
+        + b"\x02"
+        + payload
+    )
+
+
+def ethernet(payload: bytes, vlan: bool = False) -> bytes:
+    tag = b"\x81\x00\x00\x05" if vlan else b""
+    return bytes(12) + tag + b"\x08\x00" + payload
+
+
+def pcap(frames: list[bytes], link: int = dissect.ETHERNET) -> bytes:
+    out = struct.pack("<LHHlLLL", 0xA1B2C3D4, 2, 4, 0, 0, 65535, link)
+    for i, frame in enumerate(frames):
+        out += struct.pack("<LLLL", 100 + i, 500000, len(frame), len(frame)) + frame
+    return out
+
+
+def block(kind: int, body: bytes, order: str = ">") -> bytes:
+    body += bytes(-len(body) % 4)
+    return (
+        struct.pack(order + "LL", kind, len(body) + 12)
+        + body
+        + struct.pack(order + "L", len(body) + 12)
+    )
+
+
+def pcapng(frames: list[bytes], link: int) -> bytes:
+    out = block(0x0A0D0D0A, struct.pack(">LHHq", 0x1A2B3C4D, 1, 0, -1))
+    tsresol = struct.pack(">HHB3x", 9, 1, 9) + bytes(4)  # Nanoseconds
+    out += block(1, struct.pack(">HHL", link, 0, 65535) + tsresol)
+    for i, frame in enumerate(frames):
+        ns = (200 + i) * 10**9
+        head = struct.pack(">5L", 0, ns >> 32, ns & 0xFFFFFFFF, len(frame), len(frame))
+        out += block(6, head + frame)
+    return out
+
+
+def test_pcap(tmp_path):
+    path = tmp_path / "capture.pcap"
+    path.write_bytes(
+        pcap(
+            [
+                ethernet(ipv4(udp(PING))),
+                ethernet(ipv4(b"tcp", protocol=6)),
+                ethernet(ipv4(udp(COARSE, 50000, 13005)), vlan=True),
+                ethernet(ipv4(udp(b"\x01\x02\x03", 53, 50001))),  # Not an SL packet.
+            ]
+        )
+    )
+    datagrams = list(dissect.datagrams(path))
+    assert len(datagrams) == 3
+    assert datagrams[0] == (100.5, ("10.0.0.1", 13005), ("192.168.1.2", 50000), PING)
+    assert datagrams[1].payload == COARSE
+    assert [x.payload for x in dissect.datagrams(path, {53})] == [b"\x01\x02\x03"]
+
+    table = template.table(template.parse_schema(TEMPLATE))
+    found = list(dissect.packets(path, {"CoarseLocationUpdate"}, table=table))
+    assert [header.number for _, header in found] == [0xFF060000]
+    assert len(list(dissect.packets(path))) == 2
+
+
+def test_pcapng(tmp_path):
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(
+        pcapng(
+            [
+                bytes(14) + b"\x86\xdd" + ipv6(udp(PING)),
+                bytes(14) + b"\x08\x00" + ipv4(udp(COARSE)),
+            ],
+            dissect.SLL,
+        )
+    )
+    datagrams = list(dissect.datagrams(path))
+    assert [x.payload for x in datagrams] == [PING, COARSE]
+    assert datagrams[0].time == 200.0
+    assert datagrams[0].source == ("0000:0000:0000:0000:0000:0000:0000:0001", 13005)
+
+
+def test_decode(tmp_path):
+    path = tmp_path / "capture.pcap"
+    frames = [ethernet(ipv4(udp(x))) for x in (PING, COARSE) * 5]
+    path.write_bytes(
+        pcap(frames + [ethernet(ipv4(udp(packet.header(packet.low | 7, 1))))])
+    )
+    schema = template.parse_schema(TEMPLATE)
+
+    decoded = list(dissect.decode(path, schema=schema, batch=3))
+    assert [name for _, name, _ in decoded] == [
+        "StartPingCheck",
+        "CoarseLocationUpdate",
+    ] * 5 + [""]
+    assert decoded[0][2] == {"PingID": {"PingID": 1, "OldestUnacked": 55}}
+
+    pooled = list(
+        dissect.decode(path, {"StartPingCheck"}, schema=schema, processes=2, batch=2)
+    )
+    assert pooled == [x for x in decoded if x[1] == "StartPingCheck"]
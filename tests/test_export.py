@@ -0,0 +1,118 @@
+from array import array
+from parser import template, zerocode
+
+import pytest
+
+from benchmarks.vectors import IMPROVED_INSTANT_MESSAGE_2, REGION_HANDSHAKE
+from message import body, export
+from message.data import Uuid, Vector
+from message.generic import Decoder
+from tests.test_dissect import COARSE, PING
+from tests.test_template import TEMPLATE
+
+
+def test_columns():
+    assert export.columns(body.StartPingCheck._keys) == [
+        ("PingID", "number", "B"),
+        ("OldestUnacked", "number", "I"),
+    ]
+    assert export.columns({"Data": {"Position": Vector, "ID": Uuid}}) == [
+        ("Data.Position.x", "vector", "f"),
+        ("Data.Position.y", "vector", "f"),
+        ("Data.Position.z", "vector", "f"),
+        ("Data.ID", "bytes", None),
+    ]
+
+
+def test_export(tmp_path):
+    schema = template.parse_schema(TEMPLATE)
+    decoder = Decoder(schema)
+    with export.exporter(tmp_path, schema, batch=2, format="raw") as out:
+        for i in range(5):
+            out.add(float(i), *decoder.decode(COARSE))
+        out.add(9.0, *decoder.decode(PING))
+
+    pings = export.load(tmp_path, "StartPingCheck")
+    assert pings == {
+        "time": array("d", [9.0]),
+        "PingID.PingID": array("B", [1]),
+        "PingID.OldestUnacked": array("I", [55]),
+    }
+    updates = export.load(tmp_path, "CoarseLocationUpdate")
+    assert updates["time"] == array("d", range(5))
+    assert updates["Index.Prey"] == array("h", [-1] * 5)
+    locations = export.load(tmp_path, "CoarseLocationUpdate.Location")
+    assert locations["message"] == array("Q", [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+    assert locations["X"] == array("B", [128, 129] * 5)
+    assert len(list(tmp_path.glob("CoarseLocationUpdate.Location.*.bin"))) == 5
+    assert export.load(tmp_path, "CoarseLocationUpdate.AgentData") == {
+        "time": array("d"),
+        "message": array("Q"),
+        "AgentID": [],
+    }
+
+
+def test_export_error(tmp_path):
+    class full_disk:
+        def write(self, *item):
+            raise OSError("No space left on device")
+
+        def close(self):
+            pass
+
+    schema = template.parse_schema(TEMPLATE)
+    decoder = Decoder(schema)
+    out = export.exporter(tmp_path, schema, batch=1, pending=1, format="raw")
+    out._writer = full_disk()
+    with pytest.raises(OSError):
+        for i in range(10):  # Blocked on the full queue without draining.
+            out.add(float(i), *decoder.decode(PING))
+    with pytest.raises(OSError):
+        out.close()
+    assert not out._thread.is_alive()
+
+
+def test_export_message(tmp_path):
+    handshake = body.RegionHandshake.from_bytes(zerocode.hex2byte(REGION_HANDSHAKE))
+    im = body.ImprovedInstantMessage.from_bytes(
+        zerocode.hex2byte(IMPROVED_INSTANT_MESSAGE_2)
+    )
+    with export.exporter(tmp_path, format="raw") as out:
+        out.add_message(1.0, handshake)
+        out.add_message(2.0, im)
+        out.add_message(3.0, im)
+
+    regions = export.load(tmp_path, "RegionHandshake")
+    assert regions["SimName"] == [b"Fidelis\x00"]
+    assert regions["WaterHeight"] == array("f", [20.100000381469727])
+    info = export.load(tmp_path, "RegionHandshake.RegionInfo4")
+    assert info["RegionFlagsExtended"] == array("Q", [0x5C908226])
+    messages = export.load(tmp_path, "ImprovedInstantMessage")
+    assert messages["Message"] == [b"this is a test\x00"] * 2
+    assert messages["Position.z"] == array("f", [im.data("Position")._data[2]] * 2)
+    assert len(messages["AgentID"][0]) == 16
+
+
+def coarse(tmp_path, format: str):
+    schema = template.parse_schema(TEMPLATE)
+    decoder = Decoder(schema)
+    with export.exporter(tmp_path, schema, batch=2, format=format) as out:
+        for i in range(3):
+            out.add(float(i), *decoder.decode(COARSE))
+
+
+def test_parquet(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    coarse(tmp_path, "parquet")
+    table = parquet.read_table(tmp_path / "CoarseLocationUpdate.Location.parquet")
+    assert table.column("X").to_pylist() == [128, 129] * 3
+    assert table.column("message").to_pylist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_npz(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    coarse(tmp_path, "npz")
+    chunk = numpy.load(tmp_path / "CoarseLocationUpdate.Location.00000.npz")
+    assert list(chunk["X"]) == [128, 129]
+    chunk = numpy.load(tmp_path / "CoarseLocationUpdate.AgentData.00000.npz")
+    assert list(chunk["AgentID.offsets"]) == [0]
@@ -0,0 +1,23 @@
+from parser import zerocode
+
+import im
+from benchmarks.vectors import (
+    IMPROVED_INSTANT_MESSAGE_2,
+    chat_from_simulator,
+    instant_message,
+)
+
+
+def test_parse_im():
+    message = im.parse_im(zerocode.hex2byte(IMPROVED_INSTANT_MESSAGE_2))
+    assert message.FromAgentName == "Wulfie Reanimator"
+    assert message.Message == "this is a test"
+    assert message.Dialog == im.Dialog.IM
+
+    assert im.parse_im(instant_message("round trip")).Message == "round trip"
+
+
+def test_parse_chat():
+    chat = im.parse_chat(chat_from_simulator("hello"))
+    assert (chat.FromName, chat.Message) == ("Wulfie Reanimator", "hello")
+    assert chat.Position == (128.0, 128.0, 25.0)
@@ -0,0 +1,110 @@
+from socket import AF_INET, SOCK_DGRAM, socket
+
+import pytest
+from parser import zerocode
+
+import packet
+from benchmarks.vectors import REGION_HANDSHAKE
+from tests.test_circuit import region
+
+
+def test_parse_header():
+    data = zerocode.hex2byte(REGION_HANDSHAKE)
+    header = packet.parse_header(data)
+    assert header.number == packet.message_number(data) == 0xFFFF0094
+    assert (header.id, header.frequency) == packet.human_message(data)
+    assert header.reliable and header.zerocoded and not header.resent
+    assert header.body == zerocode.decode(data[packet.BODY_BYTE :])
+    assert header.offset == 4
+    assert str(header) == "[2] (Low 148) +0 Reliable Encoded"
+
+
+def test_parse_header_frequencies():
+    extra = b"\x01\x02"
+    for number, id, frequency in (
+        (4 << 24, 4, "High"),
+        (0xFF05 << 16, 5, "Medium"),
+        (packet.UseCircuitCode, 3, "Low"),
+        (packet.PacketAck, packet.PacketAck, "Fixed"),
+    ):
+        data = packet.header(number, 9, packet.RESENT, len(extra), extra) + b"\x2a"
+        header = packet.parse_header(data)
+        assert (header.number, header.id, header.frequency) == (number, id, frequency)
+        assert (header.sequence, header.extra, header.resent) == (9, 2, True)
+        assert header.body[header.offset] == 0x2A
+
+    with pytest.raises(ValueError):
+        packet.parse_header(b"\x00\x00\x00\x00\x01\x00\xff\xff")
+
+
+def test_header_zerocoded():
+    data = packet.header(packet.RegionHandshakeReply, 3, packet.ZEROCODED)
+    assert data[packet.BODY_BYTE :] == b"\xff\xff\x00\x01\x95"
+    assert packet.parse_header(data).number == packet.RegionHandshakeReply
+
+
+def test_prebuilt():
+    throttle = (
+        packet.prebuilt(packet.UseCircuitCode, b"\x01\x02")
+        .counter("GenCounter", packet.u32)
+        .append(packet.u8, 7)
+    )
+    expected = packet.header(packet.UseCircuitCode, 5) + b"\x01\x02"
+    assert throttle(5) == expected + b"\x00\x00\x00\x00\x07"
+    data = bytes(throttle(6, GenCounter=258))
+    assert (
+        data
+        == packet.header(packet.UseCircuitCode, 6) + b"\x01\x02\x02\x01\x00\x00\x07"
+    )
+    assert throttle(7) is throttle.data  # Patched in place, counters are kept.
+    assert throttle.data[-5:] == b"\x02\x01\x00\x00\x07"
+
+
+def test_header_cached():
+    data = packet.header(packet.UseCircuitCode, 5, packet.RELIABLE, 2, b"\x01\x02")
+    assert data == b"\x40\x00\x00\x00\x05\x02\x01\x02\xff\xff\x00\x03"
+    assert packet.header(4 << 24, 1) == b"\x00\x00\x00\x00\x01\x00\x04"
+    assert packet.header(0xFF05 << 16, 1) == b"\x00\x00\x00\x00\x01\x00\xff\x05"
+    with pytest.raises(Exception, match="Extra byte"):
+        packet.header(4 << 24, 1, 0, 1, b"\x01\x02")
+
+
+def test_send_buffer():
+    buffer = packet.send_buffer(16)
+    end = buffer.fill((b"\x01\x02", bytearray(b"\x03"), memoryview(b"\x04\x05")))
+    assert bytes(buffer.view(end)) == b"\x01\x02\x03\x04\x05"
+    assert bytes(buffer.view(buffer.fill((b"\x09",)))) == b"\x09"
+    with pytest.raises(ValueError, match="larger than the send buffer"):
+        buffer.fill((bytes(10), bytes(10)))
+
+
+def test_client_send():
+    sim = region()
+    client = packet.client()
+    client.sequence = 1
+    client.udp = socket(AF_INET, SOCK_DGRAM)
+    client.udp.connect(sim.getsockname())
+    client.send(packet.header(packet.UseCircuitCode, 1), b"\x01", memoryview(b"\x02"))
+    data, _ = sim.recvfrom(64)
+    assert data == packet.header(packet.UseCircuitCode, 1) + b"\x01\x02"
+    assert client.sequence == 2
+    client.udp.close()
+    sim.close()
+
+
+def test_receive_ring():
+    sim = region()
+    udp = socket(AF_INET, SOCK_DGRAM)
+    udp.connect(sim.getsockname())
+    sim.connect(udp.getsockname())
+    ring = packet.receive_ring(slots=2, size=16)
+    for data in (b"one", b"two", b"three"):
+        sim.send(data)
+    udp.setblocking(False)
+    first, second = ring.drain(udp, 2)
+    assert (first, second) == (b"one", b"two")
+    assert ring.drain(udp, 5) == [b"three"]
+    assert first == b"thr"  # Its slot was reused.
+    assert ring.drain(udp, 5) == []
+    udp.close()
+    sim.close()
@@ -0,0 +1,86 @@
+import asyncio
+import xmlrpc.client
+
+import pytest
+
+import packet
+from tests.login_server import login_server
+from tests.test_circuit import region
+
+
+@pytest.fixture
+def server():
+    server = login_server().start()
+    yield server
+    server.stop()
+
+
+def test_pool(server):
+    server.delay = 0.05
+    pool = packet.login_pool(server.uri, connections=2)
+
+    async def run():
+        logins = [
+            pool.login(packet.client.login_params("bot", str(i), "password"))
+            for i in range(6)
+        ]
+        return await asyncio.gather(*logins)
+
+    responses = asyncio.run(run())
+    pool.close()
+    assert [x["first_name"] for x in responses] == ["bot"] * 6
+    assert server.peak <= 2
+    assert len(server.connections) == 2  # Reused for the other four.
+
+
+def test_retry(server):
+    server.failures = 2
+    pool = packet.login_pool(server.uri, retries=2, backoff=0.01)
+    response = asyncio.run(pool.login(packet.client.login_params("a", "b", "password")))
+    assert response["login"] == "true" and len(server.logins) == 1
+
+    server.failures = 3
+    with pytest.raises(xmlrpc.client.ProtocolError):
+        asyncio.run(pool.login(packet.client.login_params("a", "b", "password")))
+    assert server.failures == 0 and len(server.logins) == 1
+
+
+def test_cancelled(server):
+    server.delay = 0.2
+    pool = packet.login_pool(server.uri, connections=1)
+
+    async def run():
+        params = packet.client.login_params("a", "b", "password")
+        first = asyncio.create_task(pool.login(params))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert pool._idle.empty()  # Still in use by the worker thread.
+        return await pool.login(params)
+
+    response = asyncio.run(run())
+    pool.close()
+    assert response["login"] == "true"
+    assert server.peak == 1 and len(server.logins) == 2
+
+
+def test_refused(server):
+    pool = packet.login_pool(server.uri, backoff=0.01)
+    with pytest.raises(packet.LoginError, match="Wrong password"):
+        asyncio.run(pool.login(packet.client.login_params("a", "b", "wrong")))
+
+
+def test_circuit_login(server):
+    sim = region()
+    server.sim_port = sim.getsockname()[1]
+
+    async def run():
+        client = packet.circuit()
+        await client.login("a", "b", "password", packet.login_pool(server.uri))
+        client.send(packet.header(packet.UseCircuitCode, client.sequence))
+        data, _ = await asyncio.to_thread(sim.recvfrom, 64)
+        client.close()
+        return data
+
+    assert asyncio.run(run())[6:10] == b"\xff\xff\x00\x03"
+    sim.close()
@@ -0,0 +1,100 @@
+import struct
+
+import pytest
+
+import packet
+from packet.reliable import is_packet_ack, parse_packet_ack, reliability
+
+
+class clock:
+    """Manually advanced time source."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def reliable_packet(sequence: int) -> bytes:
+    return packet.header(packet.UseCircuitCode, sequence, packet.RELIABLE) + b"data"
+
+
+def test_rtt():
+    time = clock()
+    engine = reliability(
+        lambda data: None, min_timeout=0.25, max_timeout=5.0, clock=time
+    )
+
+    engine.track(reliable_packet(1))
+    time.now += 0.2
+    assert engine.acknowledge(1)
+    assert engine.srtt == pytest.approx(0.2)
+    assert engine.rttvar == pytest.approx(0.1)
+    assert engine.timeout == pytest.approx(0.6)  # srtt + 4 * rttvar
+
+    engine.track(reliable_packet(2))
+    time.now += 0.4
+    assert engine.acknowledge(2)
+    assert engine.srtt == pytest.approx(0.875 * 0.2 + 0.125 * 0.4)
+    assert engine.rttvar == pytest.approx(0.75 * 0.1 + 0.25 * 0.2)
+    assert not engine.acknowledge(2)  # Repeated ACK
+
+    engine.srtt, engine.rttvar = 0.001, 0.0
+    engine.sample(0.001)
+    assert engine.timeout == 0.25  # Clamped to min_timeout
+
+    engine.sample(60.0)
+    assert engine.timeout == 5.0  # Clamped to max_timeout
+
+
+def test_retransmit():
+    time = clock()
+    sent = []
+    engine = reliability(sent.append, max_retries=2, clock=time)
+    results = []
+
+    engine.track(reliable_packet(7), results.append)
+    assert engine.resend_expired() == 0
+    assert engine.next_deadline() == pytest.approx(101.0)
+
+    time.now += 1.0
+    assert engine.resend_expired() == 1
+    assert sent[-1][0] & packet.RESENT
+    assert int.from_bytes(sent[-1][1:5]) == 7
+    assert engine.pending[7].timeout == pytest.approx(2.0)
+
+    time.now += 2.0
+    assert engine.resend_expired() == 1
+    assert engine.pending[7].timeout == pytest.approx(4.0)
+
+    time.now += 4.0
+    assert engine.resend_expired() == 0  # Out of retries
+    assert results == [False]
+    assert not engine.pending
+
+
+def test_karn():
+    time = clock()
+    engine = reliability(lambda data: None, clock=time)
+    results = []
+
+    engine.track(reliable_packet(3), results.append)
+    time.now += 1.0
+    engine.resend_expired()
+    time.now += 0.1
+    assert engine.acknowledge(3)
+    assert engine.srtt is None  # Ambiguous sample from a resent packet
+    assert engine.timeout == 1.0
+    assert results == [True]
+
+
+def test_packet_ack():
+    data = b"\x00\x00\x00\x00\x05\x00\xff\xff\xff\xfb\x03" + struct.pack(
+        "<3L", 1, 2, 0x01020304
+    )
+    assert is_packet_ack(data)
+    assert parse_packet_ack(data) == [1, 2, 0x01020304]
+
+    assert not is_packet_ack(b"reply")
+    assert not is_packet_ack(reliable_packet(1))
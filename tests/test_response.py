@@ -0,0 +1,97 @@
+import asyncio
+import io
+import xmlrpc.client
+
+import pytest
+
+import packet
+from packet.response import parse_login, transport
+from tests.login_server import login_server
+
+SKELETON = [
+    {"folder_id": str(i), "name": f"Folder {i}", "type_default": 8} for i in range(3)
+]
+
+
+def response(value: dict) -> io.BytesIO:
+    xml = xmlrpc.client.dumps((value,), methodresponse=True, allow_none=True)
+    return io.BytesIO(xml.encode())
+
+
+def test_keys():
+    stream = response(
+        {
+            "login": "true",
+            "circuit_code": 7,
+            "sim_port": 13000,
+            "inventory-skeleton": SKELETON,
+            "buddy-list": [{"buddy_id": "x", "flags": {"a": [1, 2]}}],
+            "look_at": "[r1,r0,r0]",
+        }
+    )
+    assert parse_login(stream, chunk=64) == {
+        "login": "true",
+        "circuit_code": 7,
+        "sim_port": 13000,
+    }
+
+
+def test_consumers():
+    stream = response(
+        {"login": "true", "inventory-skeleton": SKELETON, "home": {"region": [1, 2]}}
+    )
+    folders, home = [], []
+    consumers = {"inventory-skeleton": folders.append, "home": home.append}
+    result = parse_login(stream, ["login"], consumers, chunk=32)
+    assert result == {"login": "true"}
+    assert folders == SKELETON
+    assert home == [{"region": [1, 2]}]
+
+
+def test_values():
+    stream = response({"a": 1.5, "b": True, "c": None, "d": b"\x00\x01", "e": [1, "x"]})
+    result = parse_login(stream, "abcde")
+    assert result == {"a": 1.5, "b": True, "c": None, "d": b"\x00\x01", "e": [1, "x"]}
+
+
+def test_fault():
+    xml = xmlrpc.client.dumps(xmlrpc.client.Fault(2, "Bad login"), methodresponse=True)
+    with pytest.raises(xmlrpc.client.Fault) as error:
+        parse_login(io.BytesIO(xml.encode()))
+    assert error.value.faultCode == 2 and error.value.faultString == "Bad login"
+
+
+def test_pool():
+    server = login_server().start()
+    server.extra = {
+        "inventory-skeleton": SKELETON * 100,
+        "inventory-root": [{"folder_id": "r"}],
+    }
+    pool = packet.login_pool(server.uri)
+    folders = []
+    params = packet.client.login_params("a", "b", "password")
+    try:
+        result = asyncio.run(pool.login(params, {"inventory-skeleton": folders.append}))
+        again = asyncio.run(pool.login(params))
+    finally:
+        pool.close()
+        server.stop()
+    assert result["sim_port"] == 13000 and "inventory-skeleton" not in result
+    assert "inventory-root" not in result
+    assert len(folders) == 300
+    assert "inventory-skeleton" not in again and len(folders) == 300
+
+
+def test_client_login(monkeypatch):
+    server = login_server().start()
+    server.extra = {"inventory-skeleton": SKELETON}
+    proxy = xmlrpc.client.ServerProxy(server.uri, transport=transport(server.uri))
+    monkeypatch.setattr(packet.client, "_login_proxy", proxy)
+    client = packet.client()
+    try:
+        response = client.login("a", "b", "password")
+    finally:
+        proxy("close")()
+        server.stop()
+    client.udp.close()
+    assert response["sim_port"] == 13000 and "inventory-skeleton" not in response
@@ -0,0 +1,161 @@
+from array import array
+from parser import template, zerocode
+
+from message.generic import Decoder
+
+TEMPLATE = """
+version 2.0
+
+// Ping check
+{
+	StartPingCheck High 1 NotTrusted Unencoded
+	{
+		PingID Single
+		{	PingID			U8	}
+		{	OldestUnacked	U32	}	// Current oldest "unacked" packet on the sender side
+	}
+}
+
+{
+	CoarseLocationUpdate Medium 6 Trusted Unencoded
+	{
+		Location Variable
+		{	X	U8	}
+		{	Y	U8	}
+		{	Z	U8	}
+	}
+	{
+		Index Single
+		{	You		S16	}
+		{	Prey	S16	}
+	}
+	{
+		AgentData Variable
+		{	AgentID	LLUUID	}
+	}
+}
+
+{
+	ImprovedInstantMessage Low 254 NotTrusted Zerocoded
+	{
+		AgentData Single
+		{	AgentID		LLUUID	}
+		{	SessionID	LLUUID	}
+	}
+	{
+		MessageBlock Single
+		{	FromGroup		BOOL	}
+		{	ToAgentID		LLUUID	}
+		{	ParentEstateID	U32	}
+		{	RegionID		LLUUID	}
+		{	Position		LLVector3	}
+		{	Offline			U8	}
+		{	Dialog			U8	}
+		{	ID				LLUUID	}
+		{	Timestamp		U32	}
+		{	FromAgentName	Variable	1	}
+		{	Message			Variable	2	}
+		{	BinaryBucket	Variable	2	}
+	}
+	{
+		EstateBlock Single
+		{	EstateID	U32	}
+	}
+}
+
+{
+	PacketAck Fixed 0xFFFFFFFB NotTrusted Unencoded
+	{
+		Packets Variable
+		{	ID	U32	}
+	}
+}
+"""
+
+
+def test_schema():
+    schema = template.parse_schema(TEMPLATE)
+    message = template.table(schema)
+
+    assert message["PacketAck"] == 0xFFFFFFFB
+    assert message["StartPingCheck"] == 0x01000000
+    assert message["CoarseLocationUpdate"] == 0xFF060000
+    assert message[0xFFFF00FE] == "ImprovedInstantMessage"
+
+    im = schema["ImprovedInstantMessage"]
+    assert im.zerocoded and not im.trusted
+    assert [x.name for x in im.blocks] == ["AgentData", "MessageBlock", "EstateBlock"]
+    assert im.blocks[1].fields[-1] == template.Field("BinaryBucket", "Variable", 2)
+
+
+def test_decode():
+    decoder = Decoder(template.parse_schema(TEMPLATE))
+
+    name, blocks = decoder.decode(
+        zerocode.hex2byte("00 00 00 00 38 00 01 01 37 00 00 00")
+    )
+    assert name == "StartPingCheck"
+    assert blocks == {"PingID": {"PingID": 1, "OldestUnacked": 55}}
+
+    name, blocks = decoder.decode(
+        zerocode.hex2byte("00 00 00 00 01 00 FF 06 02 80 80 14 81 7F 15 00 00 FF FF 00")
+    )
+    assert name == "CoarseLocationUpdate"
+    location = blocks["Location"]
+    assert location == {
+        "X": array("B", [128, 129]),
+        "Y": array("B", [128, 127]),
+        "Z": array("B", [20, 21]),
+    }
+    assert location.records()[1] == {"X": 129, "Y": 127, "Z": 21}
+    assert blocks["Index"] == {"You": 0, "Prey": -1}
+    assert blocks["AgentData"].count == 0 and blocks["AgentData"].rows() == []
+
+
+def test_decode_zerocoded():
+    decoder = Decoder(template.parse_schema(TEMPLATE))
+    name, blocks = decoder.decode(
+        zerocode.hex2byte(
+            "C0 00 00 00 3C 00 FF FF 00 01 FE 77 9E 1D 56 55 00 01 4E 22 94 0A CD 7B 5A DD DB E0 00 11 28 C5 EF B6 FC AA 4E D5 9C F1 A6 40 D1 A9 92 72 01 00 03 BD E2 D4 99 11 35 49 9C 82 32 C2 D6 8E 00 01 8C AC 2A B0 E3 42 F3 15 A6 41 FD 8B BC 41 00 02 5F 5B F2 E0 A9 AA 00 01 F7 08 FB 6B 3B 8B 74 49 92 00 04 12 57 75 6C 66 69 65 20 52 65 61 6E 69 6D 61 74 6F 72 00 01 05 00 01 74 65 73 74 00 01 01 00 02 A5 A4 00 02"  # NOQA
+        )
+    )
+    assert name == "ImprovedInstantMessage"
+    assert blocks["MessageBlock"]["FromAgentName"] == (18, b"Wulfie Reanimator\x00")
+    assert blocks["MessageBlock"]["Message"] == (5, b"test\x00")
+    assert blocks["EstateBlock"] == {"EstateID": 0xA4A5}
+
+
+def test_cache(tmp_path, monkeypatch):
+    path = tmp_path / "message_template.msg"
+    path.write_text(TEMPLATE)
+    cache = tmp_path / "cache"
+
+    schema = template.load(str(path), str(cache))
+    assert len(list(cache.iterdir())) == 1
+
+    def fail(text):
+        raise AssertionError("template parsed again")
+
+    monkeypatch.setattr(template, "parse_schema", fail)
+    assert template.load(str(path), str(cache)) == schema
+
+    path.touch()  # Changed mtime with the same content uses the hash.
+    assert template.load(str(path), str(cache)) == schema
+
+
+def test_locate(tmp_path, monkeypatch):
+    path = tmp_path / "custom.msg"
+    path.write_text(TEMPLATE)
+    monkeypatch.setenv("SL_MESSAGE_TEMPLATE", str(path))
+    assert template.locate() == str(path)
+
+
+def test_view():
+    decoder = Decoder(template.parse_schema(TEMPLATE))
+    data = zerocode.hex2byte(
+        "00 00 00 00 01 00 FF 06 02 80 80 14 81 7F 15 00 00 FF FF 00"
+    )
+    name, view = decoder.view(data)
+    assert name == "CoarseLocationUpdate"
+    assert view["Index"] == {"You": 0, "Prey": -1}
+    assert view.materialize() == decoder.decode(data)[1]
@@ -0,0 +1,48 @@
+import logging
+
+import packet
+from tests.test_dispatch import PING, TABLE
+
+
+class records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+def logger(level: int) -> tuple[logging.Logger, records]:
+    log = logging.getLogger(f"test_trace_{level}")
+    log.propagate = False
+    log.setLevel(level)
+    log.handlers = [handler := records()]
+    return log, handler
+
+
+def test_trace():
+    log, handler = logger(logging.DEBUG)
+    trace = packet.tracer(log, {"StartPingCheck": 0.25, "KickUser": 0}, table=TABLE)
+    ping = packet.header(PING, 1) + b"\x05\x00\x00\x00\x00"
+    for _ in range(8):
+        trace.trace(ping)
+    trace.trace(packet.header(packet.low | 163, 2))
+    trace.trace(packet.header(packet.UseCircuitCode, 3), direction="out")
+    # Logged, not raised, on the writer thread.
+    trace.trace(b"\x00\x00\x00\x00\x04\x00")
+    trace.stop()
+
+    messages = [x.getMessage() for x in handler.records]
+    assert len(messages) == 4  # Every fourth ping, twice.
+    assert messages[0].startswith("in [1] (High 1) +0\tStartPingCheck\n\tUDP: 00 00")
+    assert messages[2].startswith("out [3] (Low 3) +0\tUseCircuitCode")
+    assert messages[3].startswith("in malformed packet")
+
+
+def test_disabled():
+    log, handler = logger(logging.INFO)
+    trace = packet.tracer(log, table=TABLE)
+    trace.trace(packet.header(packet.UseCircuitCode, 1))
+    trace.stop()
+    assert trace._thread is None and not handler.records
@@ -0,0 +1,51 @@
+from parser import zerocode
+
+import packet
+from benchmarks.vectors import IMPROVED_INSTANT_MESSAGE_1, REGION_HANDSHAKE
+
+
+def test_decode():
+    assert zerocode.decode(b"") == b""
+    assert zerocode.decode(b"\x00\x03") == b"\x00\x00\x00"
+    assert zerocode.decode(b"\x01\x00\x01\x02\x00\xff") == b"\x01\x00\x02" + bytes(255)
+
+
+def test_round_trip():
+    for data in (b"\x01\x00\x00\x02", bytes(10), b"\xff" * 4, b"\x00\x01\x00"):
+        assert zerocode.decode(zerocode.encode(data)) == data
+
+
+def test_encode_runs():
+    assert zerocode.encode(bytes(255)) == b"\x00\xff"
+    assert zerocode.encode(b"\x01" + bytes(256)) == b"\x01\x00\xff\x00\x01"
+    assert zerocode.encode(bytes(600) + b"\x02") == b"\x00\xff" * 2 + b"\x00\x5a\x02"
+
+
+def test_decode_prefix():
+    for hexa in (REGION_HANDSHAKE, IMPROVED_INSTANT_MESSAGE_1):
+        data = zerocode.hex2byte(hexa)
+        body = zerocode.decode(data[packet.BODY_BYTE :])
+        for size in (1, 2, 4, 5, 40, len(body), len(body) + 10):
+            assert zerocode.decode_prefix(data, size, packet.BODY_BYTE) == body[:size]
+
+
+def test_message_number():
+    assert packet.message_number(zerocode.hex2byte(REGION_HANDSHAKE)) == 0xFFFF0094
+
+
+def test_encode_all():
+    assert zerocode.encode(bytes(300)) == b"\x00\xff\x00\x2d"
+    assert (
+        zerocode.encode_all(b"\x01\x00", b"", b"\x00\x00", b"\x02")
+        == b"\x01\x00\x03\x02"
+    )
+    assert zerocode.encode_all(b"\x00", memoryview(b"\x00\x05")) == b"\x00\x02\x05"
+
+    out = bytearray(b"header")
+    zerocode.encode_into(out, [b"\x00" * 2, b"\x07"])
+    assert out == b"header\x00\x02\x07"
+
+
+def test_byte2hex():
+    assert zerocode.byte2hex(b"\x00\xab\x10") == "00 AB 10"
+    assert zerocode.byte2hex(b"") == ""